@@ -91,6 +91,16 @@ class KeyboardHandler:
                     if event_type == 'press':
                         return self._handle_key(key)
 
+                elif msg.get('type') == 'key_events':
+                    # 守护进程把快速连按合并为一条批次消息，
+                    # 逐个按原顺序处理其中的按下事件
+                    result = None
+                    for event in msg.get('events', []):
+                        if event.get('event_type') == 'press':
+                            result = self._handle_key(event.get('key'))
+                    if result is not None:
+                        return result
+
                 return msg
         except socket.timeout:
             pass
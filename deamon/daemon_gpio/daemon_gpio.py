@@ -5,6 +5,8 @@ GPIO守护进程
 采用JSON数据格式进行命令传输
 """
 
+import array
+import itertools
 import json
 import socket
 import threading
@@ -13,9 +15,43 @@ import serial
 import configparser
 import struct
 import os
+import re
 import select
+import selectors
 from pathlib import Path
 import queue
+from concurrent.futures import ThreadPoolExecutor
+
+# JSON编解码：优先使用orjson（C实现且直接处理bytes，免去decode/encode），
+# 未安装时回退到标准库json（orjson.JSONDecodeError兼容json.JSONDecodeError）
+try:
+    import orjson
+
+    _json_loads = orjson.loads
+
+    def _json_dumps(obj):
+        # gpio_states等字典以int引脚号为键，orjson默认拒绝非str键，
+        # OPT_NON_STR_KEYS让行为与标准库json一致（int键序列化为字符串）
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+except ImportError:
+    def _json_loads(data):
+        return json.loads(data)
+
+    def _json_dumps(obj):
+        return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
+# 状态广播可选用msgpack序列化（体积更小、编码更快），未安装时自动回退JSON
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# SPI数据预处理表：'0'/'1'字符一次性映射为0/1整数，空白字符直接删除
+_SPI_BIT_TABLE = bytes.maketrans(b'01', b'\x00\x01')
+
+# geter设备上报数据的解析正则，模块加载时编译一次
+# 直接匹配原始字节，省去接收路径上的ascii解码
+_CH_RE = re.compile(rb'CH(\d+):([01])')
 
 
 class USBGPIOController:
@@ -25,15 +61,21 @@ class USBGPIOController:
         self.tty_path = tty_path
         self.baudrate = baudrate
         self.ser = None
+        self._ser_fd = None
         self.simulate = simulate
         self.debug = debug  # 添加调试标志
-        self.gpio_states = {}  # 用于模拟模式下的GPIO状态
+        # GPIO引脚号是小整数，状态表用定长数组代替字典，
+        # 每次查询/更新只是一次下标访问，无哈希开销且整表常驻L1缓存
+        self.gpio_states = array.array('B', [0] * 256)  # 用于模拟模式下的GPIO状态
         
-        # 添加一个状态跟踪字典，记录当前各GPIO引脚的状态
-        self.current_gpio_states = {}
+        # 当前各GPIO引脚的状态跟踪，255表示未知（尚未设置过）
+        self.current_gpio_states = array.array('B', [255] * 256)
         
         # 添加数据缓冲区，用于累积流式数据避免截断
-        self.data_buffer = ""
+        # 使用bytearray保存原始字节，追加为均摊O(1)，避免str拼接的整体复制
+        self.data_buffer = bytearray()
+        # 缓冲区中已完成解析的偏移量，增量扫描只处理新追加的数据
+        self.parsed_offset = 0
         
         if not simulate:
             self.connect()
@@ -44,6 +86,8 @@ class USBGPIOController:
         """连接到USB GPIO设备"""
         try:
             self.ser = serial.Serial(self.tty_path, self.baudrate, timeout=0.001)
+            # 缓存fd供SPI大帧直接os.write使用，绕过pyserial的每次调用开销
+            self._ser_fd = self.ser.fileno()
             print(f"成功连接到 {self.tty_path}")
         except Exception as e:
             print(f"错误: 无法连接到设备 {self.tty_path}: {e}")
@@ -62,28 +106,23 @@ class USBGPIOController:
     def send_command(self, command):
         """发送命令到USB GPIO设备"""
         
-        # 调试：打印发送的指令
-        if hasattr(self, 'debug') and self.debug:
+        # 调试：打印发送的指令（debug在__init__中必定存在，无需hasattr）
+        if self.debug:
             print(f"调试: 发送指令 - {[hex(b) for b in command]}")
         
         if self.simulate:
             # 模拟模式：解析命令并更新GPIO状态
             if command[0] == 0x3A:  # GPIO设置命令
                 # 解析命令格式: 3A [pin1] [state1] [pin2] [state2] ...
-                i = 1
-                while i < len(command):
-                    if i + 1 < len(command):
-                        pin = command[i]
-                        state = command[i + 1]
-                        self.gpio_states[pin] = state
-                        self.current_gpio_states[pin] = state  # 同时更新当前状态
-                        i += 2
-                    else:
-                        break
+                # 用步进memoryview成对取出，代替Python级索引循环
+                mv = memoryview(command)
+                for pin, state in zip(mv[1::2], mv[2::2]):
+                    self.gpio_states[pin] = state
+                    self.current_gpio_states[pin] = state  # 同时更新当前状态
             elif command[0] == 0x3F:  # GPIO读取命令
                 # 模拟返回值
                 pin = command[1]
-                state = self.gpio_states.get(pin, 0)
+                state = self.gpio_states[pin]
                 # 在模拟模式下，我们不实际发送返回值
             return True
         
@@ -109,6 +148,11 @@ class USBGPIOController:
         设置GPIO状态，gpio_states为字典 {pin: state, ...}
         优化：只对状态发生变化的GPIO引脚发送命令
         """
+        # 单引脚调用直接走快速路径，跳过变化过滤字典的构建
+        if len(gpio_states) == 1:
+            (pin, state), = gpio_states.items()
+            return self.set_gpio_one(pin, state)
+        
         # 筛选出状态真正发生变化的GPIO
         changed_states = {}
         for pin, new_state in gpio_states.items():
@@ -116,9 +160,8 @@ class USBGPIOController:
             gpio_pin = int(pin)
             state = int(new_state)
             
-            # 检查是否是第一次设置或者状态是否发生了变化
-            current_state = self.current_gpio_states.get(gpio_pin)
-            if current_state is None or current_state != state:
+            # 检查是否是第一次设置（255）或者状态是否发生了变化
+            if self.current_gpio_states[gpio_pin] != state:
                 changed_states[gpio_pin] = state
                 self.current_gpio_states[gpio_pin] = state  # 更新当前状态
         
@@ -127,17 +170,31 @@ class USBGPIOController:
             return True
         
         # 发送实际发生变化的GPIO状态
-        command = bytearray([0x3A])
-        for gpio_pin, state in changed_states.items():
-            command.append(gpio_pin)
-            command.append(state)
-        return self.send_command(bytes(command))
+        # 一次分配拼出完整命令，避免bytearray逐字节append的增长检查
+        command = b'\x3A' + bytes(itertools.chain.from_iterable(changed_states.items()))
+        return self.send_command(command)
     
+    def set_gpio_one(self, gpio_pin, state):
+        """
+        设置单个GPIO状态的快速路径
+        优化：绝大多数调用（如set_spi逐位操作）只涉及一个引脚，
+        跳过set_gpio的字典构建和遍历，直接比较、更新并发送3字节命令
+        """
+        gpio_pin = int(gpio_pin)
+        state = int(state)
+
+        # 状态未变化时直接返回，与set_gpio的变化过滤逻辑一致
+        if self.current_gpio_states[gpio_pin] == state:
+            return True
+
+        self.current_gpio_states[gpio_pin] = state
+        return self.send_command(bytes((0x3A, gpio_pin, state)))
+
     def read_gpio(self, gpio_pin):
         """读取单个GPIO状态"""
         if self.simulate:
-            # 模拟模式下返回存储的状态，如果没有则随机返回0或1
-            return self.gpio_states.get(gpio_pin, 0)
+            # 模拟模式下返回存储的状态，未设置过的引脚默认为0
+            return self.gpio_states[gpio_pin]
         
         command = bytearray([0x3F, gpio_pin])
         if not self.send_command(bytes(command)):
@@ -151,159 +208,121 @@ class USBGPIOController:
                 return response[2]
         return None
     
-    def set_spi(self, clk_pin, data_pin, cs_pin, data, cs_collection="down", lag_time=0.001, debug_spi=False):
-        """使用bit-banging方式实现SPI通信，支持任意比特数，优化GPIO设置"""
-        import time
+    def _build_spi_frame(self, clk_pin, data_pin, cs_pin, data, cs_collection="down"):
+        """
+        把一次完整的SPI传输预编译为单条0x3A命令字节流
+        返回 (frame, total_ops)，total_ops为电平操作次数，用于计算总体时序预算
+        """
+        # down: 空闲高电平，下降沿采样；up: 空闲低电平，上升沿采样
+        if cs_collection == "down":
+            clk_idle, clk_active = 1, 0
+        else:
+            clk_idle, clk_active = 0, 1
+
+        # CS拉低（开始传输）
+        frame = bytearray((0x3A, cs_pin, 0))
+        total_ops = 1
+
+        # 一次性把位字符串转成整数序列并去除空白，避免逐字符int()转换
+        bits = data.encode('ascii').translate(_SPI_BIT_TABLE, delete=b' \r\n\t')
+
+        # 每一位：DATA电平（仅在变化时）+ CLK空闲电平 + CLK采样边沿
+        # 设备协议支持 3A [pin1][st1][pin2][st2]... 多引脚命令，
+        # 把DATA电平和CLK回空闲电平合并进同一条命令，减少一半USB帧
+        last_data_state = None
+        for bit in bits:
+            if bit != last_data_state:
+                frame += bytes((0x3A, data_pin, bit, clk_pin, clk_idle,
+                                0x3A, clk_pin, clk_active))
+                last_data_state = bit
+                total_ops += 3
+            else:
+                frame += bytes((0x3A, clk_pin, clk_idle, 0x3A, clk_pin, clk_active))
+                total_ops += 2
+
+        # CS拉高（结束传输），完成一次CS切片
+        frame += bytes((0x3A, cs_pin, 1))
+        total_ops += 1
+
+        # 传输结束后各引脚的最终电平已确定，同步到状态缓存
+        if last_data_state is not None:
+            self.current_gpio_states[data_pin] = last_data_state
+        self.current_gpio_states[clk_pin] = clk_active
+        self.current_gpio_states[cs_pin] = 1
+
+        return bytes(frame), total_ops
+
+    def _write_spi_frame(self, frame):
+        """把SPI帧直接写入串口fd
         
-        start_time = time.time()
+        os.write绕过pyserial在Serial.write里的线程锁和超时处理，
+        整个SPI事务只剩一次系统调用；fd不可用时回退到send_command
+        """
+        fd = self._ser_fd
+        if fd is None:
+            return self.send_command(frame)
         
+        try:
+            view = memoryview(frame)
+            written = 0
+            while written < len(frame):
+                try:
+                    written += os.write(fd, view[written:])
+                except BlockingIOError:
+                    # 内核缓冲区满，等待fd可写
+                    select.select([], [fd], [])
+            return True
+        except Exception as e:
+            print(f"SPI快速写入失败，回退至send_command: {e}")
+            return self.send_command(frame)
+    
+    def set_spi(self, clk_pin, data_pin, cs_pin, data, cs_collection="down", lag_time=0.001, debug_spi=False):
+        """
+        使用bit-banging方式实现SPI通信，支持任意比特数
+        优化：整个传输预编译为单条命令字节流，一次串口写入完成，
+        避免逐位的Python循环、逐帧USB写入和sleep抖动
+        """
         if debug_spi:
+            start_time = time.time()
             lag_time_ms = lag_time * 1000  # 转换为毫秒用于显示
             print(f"[SPI调试] 开始SPI传输 - CLK:{clk_pin}, DATA:{data_pin}, CS:{cs_pin}, 数据长度:{len(data)}, CS触发方式:{cs_collection}, 每次操作延迟:{lag_time_ms:.3f}ms")
-        
+
         if self.simulate:
             # 模拟SPI通信
             if debug_spi:
-                lag_time_ms = lag_time * 1000  # 转换为毫秒用于显示
                 print(f"模拟SPI通信: CLK={clk_pin}, DATA={data_pin}, CS={cs_pin}, DATA={data}, CS_COLLECTION={cs_collection}, 每次操作延迟={lag_time_ms:.3f}ms")
-            
+
             # 模拟实际的操作延迟
             total_ops = 3 + len(data) * 3  # CS拉低 + (每个数据位的DATA设置+时钟下降沿+时钟拉高) + CS拉高
             total_delay = total_ops * lag_time
             time.sleep(total_delay)  # 模拟总体延迟
-            
+
             if debug_spi:
-                end_time = time.time()
-                actual_time = end_time - start_time
+                actual_time = time.time() - start_time
                 print(f"[SPI调试] 模拟传输完成，理论延迟: {total_delay:.6f}s，实际耗时: {actual_time:.6f}s")
             return
-        
-        # 拉低CS（开始传输）
-        if debug_spi:
-            print(f"[SPI调试] 设置CS({cs_pin}) = 0 (开始传输)")
-        set_start = time.time()
-        self.set_gpio({cs_pin: 0})
-        time.sleep(lag_time)
-        set_end = time.time()
-        if debug_spi:
-            print(f"[SPI调试] CS设置耗时: {set_end - set_start:.6f}s")
-        
-        # 发送数据（每一位），优化：避免不必要的电平切换
-        last_data_state = None
-        last_clk_state = None
-        
-        for i, bit in enumerate(data):
-            bit_start_time = time.time()
-            
-            # 跳过空格字符
-            if bit == ' ':
-                continue
-                
-            # 设置数据位（仅在状态变化时设置）
-            bit = int(bit)
-            if last_data_state is None or last_data_state != bit:
-                if debug_spi:
-                    print(f"[SPI调试] 设置DATA({data_pin}) = {bit} (第{i+1}位)")
-                set_start = time.time()
-                self.set_gpio({data_pin: bit})
-                time.sleep(lag_time)
-                set_end = time.time()
-                if debug_spi:
-                    print(f"[SPI调试] DATA设置耗时: {set_end - set_start:.6f}s")
-                last_data_state = bit
-            else:
-                # 数据位状态未变化，但仍需要保持延迟
-                time.sleep(lag_time)
-                if debug_spi:
-                    print(f"[SPI调试] DATA({data_pin}) = {bit} 保持不变 (第{i+1}位)")
-            
-            # 时钟脉冲 - 优化时钟线状态切换
-            if cs_collection == "down":
-                # 对于下降沿触发，先拉高时钟，再拉低
-                # 设置CLK为高电平（仅在状态变化时设置）
-                if last_clk_state is None or last_clk_state != 1:
-                    if debug_spi:
-                        print(f"[SPI调试] 设置CLK({clk_pin}) = 1")
-                    set_start = time.time()
-                    self.set_gpio({clk_pin: 1})
-                    last_clk_state = 1
-                    set_end = time.time()
-                    if debug_spi:
-                        print(f"[SPI调试] CLK拉高耗时: {set_end - set_start:.6f}s")
-                else:
-                    time.sleep(lag_time)  # 保持延迟
-                    if debug_spi:
-                        print(f"[SPI调试] CLK({clk_pin}) = 1 保持不变")
-                
-                time.sleep(lag_time)
-                
-                # 设置CLK为低电平（仅在状态变化时设置） - 下降沿采样
-                if last_clk_state != 0:
-                    if debug_spi:
-                        print(f"[SPI调试] 设置CLK({clk_pin}) = 0 (下降沿采样)")
-                    set_start = time.time()
-                    self.set_gpio({clk_pin: 0})
-                    last_clk_state = 0
-                    set_end = time.time()
-                    if debug_spi:
-                        print(f"[SPI调试] CLK拉低耗时: {set_end - set_start:.6f}s")
-                else:
-                    time.sleep(lag_time)  # 保持延迟
-                    if debug_spi:
-                        print(f"[SPI调试] CLK({clk_pin}) = 0 保持不变")
-            else:
-                # 对于上升沿触发，先拉低时钟，再拉高
-                # 设置CLK为低电平（仅在状态变化时设置）
-                if last_clk_state is None or last_clk_state != 0:
-                    if debug_spi:
-                        print(f"[SPI调试] 设置CLK({clk_pin}) = 0")
-                    set_start = time.time()
-                    self.set_gpio({clk_pin: 0})
-                    last_clk_state = 0
-                    set_end = time.time()
-                    if debug_spi:
-                        print(f"[SPI调试] CLK拉低耗时: {set_end - set_start:.6f}s")
-                else:
-                    time.sleep(lag_time)  # 保持延迟
-                    if debug_spi:
-                        print(f"[SPI调试] CLK({clk_pin}) = 0 保持不变")
-                
-                time.sleep(lag_time)
-                
-                # 设置CLK为高电平（仅在状态变化时设置） - 上升沿采样
-                if last_clk_state != 1:
-                    if debug_spi:
-                        print(f"[SPI调试] 设置CLK({clk_pin}) = 1 (上升沿采样)")
-                    set_start = time.time()
-                    self.set_gpio({clk_pin: 1})
-                    last_clk_state = 1
-                    set_end = time.time()
-                    if debug_spi:
-                        print(f"[SPI调试] CLK拉高耗时: {set_end - set_start:.6f}s")
-                else:
-                    time.sleep(lag_time)  # 保持延迟
-                    if debug_spi:
-                        print(f"[SPI调试] CLK({clk_pin}) = 1 保持不变")
-            
-            time.sleep(lag_time)
-            
-            bit_end_time = time.time()
-            if debug_spi:
-                print(f"[SPI调试] 第{i+1}位处理总耗时: {bit_end_time - bit_start_time:.6f}s")
-        
-        # 拉高CS（结束传输），完成一次CS切片
-        if debug_spi:
-            print(f"[SPI调试] 设置CS({cs_pin}) = 1 (结束传输)")
-        set_start = time.time()
-        self.set_gpio({cs_pin: 1})
-        time.sleep(lag_time)
-        set_end = time.time()
-        if debug_spi:
-            print(f"[SPI调试] CS拉高耗时: {set_end - set_start:.6f}s")
-        
-        end_time = time.time()
+
+        # 预编译整个传输为单条命令字节流，一次写入串口
+        frame, total_ops = self._build_spi_frame(clk_pin, data_pin, cs_pin, data, cs_collection)
+
+        write_start = time.monotonic()
+        if not self._write_spi_frame(frame):
+            return
+        try:
+            self.ser.flush()
+        except Exception as e:
+            print(f"SPI串口flush失败: {e}")
+
+        # 用单次sleep保持整体时序预算，替代逐次电平切换后的sleep
+        # 设备侧没有适用的延时指令（3C指令只能定时改变单个引脚，无法为
+        # 整条边沿序列定步长），边沿间隔实际由串口波特率决定；
+        # 这里只补足写入和flush之后剩余的时间预算，避免重复等待
+        remaining = lag_time * total_ops - (time.monotonic() - write_start)
+        if remaining > 0:
+            time.sleep(remaining)
+
         if debug_spi:
-            print(f"[SPI调试] SPI传输完成，总耗时: {end_time - start_time:.6f}s")
+            print(f"[SPI调试] SPI传输完成，共{total_ops}次电平操作，总耗时: {time.time() - start_time:.6f}s")
 
 
 class GPIOControlDaemon:
@@ -321,15 +340,19 @@ class GPIOControlDaemon:
         self.controllers = {}
         self.controller_configs = {}
         
-        # GPIO状态变化缓冲区和相关锁
-        self.gpio_change_buffer = {}
-        self.gpio_change_buffer_lock = threading.Lock()
-        self.gpio_change_buffer_last_send = time.time()
+        # GPIO状态变化的单生产者/单消费者队列
+        # SimpleQueue为C实现，put/get快速路径无需Python层互斥锁，
+        # 监听线程产生边沿事件时不再与广播线程争抢同一把锁
+        self.gpio_change_ring = queue.SimpleQueue()
         self.gpio_change_buffer_send_interval = 0.05  # 50毫秒的缓冲间隔
+        # 队列积压到该数量时提前唤醒广播线程，避免突发变化等满一个间隔
+        self.gpio_change_buffer_flush_threshold = 32
+        self.gpio_change_flush_event = threading.Event()
         
         # 消息ID生成相关
-        self.message_id_counter = 0
-        self.message_id_lock = threading.Lock()
+        # itertools.count的__next__在C层完成递增，线程间调用天然原子，
+        # 无需再配互斥锁
+        self.message_id_counter = itertools.count(1)
         
         # GPIO状态跟踪（用于查询功能）
         self.current_gpio_states = {}
@@ -397,21 +420,51 @@ class GPIOControlDaemon:
                 else:
                     print(f"在模拟模式下初始化控制器 {alias} 失败: {e}")
         
+        # 内核socket缓冲区大小（字节），默认1MB，可在配置文件中调整以适应突发流量
+        socket_buffer_size = self.config.getint('daemon_config', 'socket_buffer_size', fallback=1 << 20)
+
+        # 预解析SPI引脚配置：把process_spi_queue热路径上的
+        # f-string键拼接和字典查找移到配置加载时一次完成
+        for alias, cfg in self.controller_configs.items():
+            if cfg['mode'] == 'spi' and 'spi_pins' in cfg:
+                spi_pins = cfg['spi_pins']
+                cfg['spi_clk_data'] = (spi_pins.get('clk'), spi_pins.get('data'))
+                cfg['spi_cs_pins'] = {
+                    int(key[3:]): pin
+                    for key, pin in spi_pins.items() if key.startswith('cs_')
+                }
+                
+                # 预解析延迟时间（配置文件中是毫秒，这里直接换算成秒），
+                # 免去每个SPI任务执行时的float解析和异常处理
+                try:
+                    lag_time_ms = float(str(cfg['config'].get('lag_time', 1.0)).split('#')[0].strip())
+                    if lag_time_ms <= 0:
+                        lag_time_ms = 1.0  # 确保延迟值为正数
+                except (ValueError, TypeError):
+                    lag_time_ms = 1.0  # 默认值
+                cfg['lag_time_sec'] = lag_time_ms / 1000.0
+        
         # 创建控制Socket
+        # NONBLOCK避免recvfrom阻塞（主循环已用select驱动），CLOEXEC防止fd泄漏到子进程
         socket_path = self.config.get('daemon_config', 'socket_path', fallback='/tmp/gpio.sock')
         if os.path.exists(socket_path):
             os.unlink(socket_path)
-        
-        self.control_socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+
+        self.control_socket = socket.socket(
+            socket.AF_UNIX, socket.SOCK_DGRAM | socket.SOCK_NONBLOCK | socket.SOCK_CLOEXEC)
+        self.control_socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, socket_buffer_size)
         self.control_socket.bind(socket_path)
         os.chmod(socket_path, 0o777)  # 设置权限以便其他进程访问
-        
+
         # 创建状态监听Socket
         get_status_path = self.config.get('daemon_config', 'get_statu_path', fallback='/tmp/gpio_get.sock')
         if os.path.exists(get_status_path):
             os.unlink(get_status_path)
-        
-        self.status_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+        self.status_socket = socket.socket(
+            socket.AF_UNIX, socket.SOCK_STREAM | socket.SOCK_NONBLOCK | socket.SOCK_CLOEXEC)
+        self.status_socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, socket_buffer_size)
+        self.status_socket.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
         self.status_socket.bind(get_status_path)
         self.status_socket.listen(10)  # 最多允许10个并发连接
         os.chmod(get_status_path, 0o777)
@@ -419,12 +472,37 @@ class GPIOControlDaemon:
         # 存储状态监听客户端
         self.status_clients = []
         self.status_clients_lock = threading.Lock()
+        # 慢客户端积压计数：发送缓冲区连续写满达到上限即判定为失速并踢除，
+        # 避免单个不消费数据的客户端拖慢整个广播
+        self._client_stall_counts = {}
+        self.client_stall_limit = 8
+        # 部分写入时留存的未发送尾部：下个广播周期优先补发，
+        # 保证客户端看到的字节流不会出现被截断的半条JSON
+        self._client_send_backlogs = {}
+        
+        # 状态广播序列化格式：json（默认，兼容现有客户端）或msgpack
+        serializer = self.config.get('daemon_config', 'status_serializer', fallback='json').strip().lower()
+        if serializer == 'msgpack' and msgpack is None:
+            print("警告: 配置要求msgpack序列化但未安装msgpack包，回退到json")
+            serializer = 'json'
+        self.status_serializer = serializer
         
         # 为SPI操作添加队列和锁，确保SPI操作串行执行
         self.spi_queue = queue.Queue()
         self.spi_processing_lock = threading.Lock()  # 确保SPI处理的互斥性
         self.spi_worker_thread = None
         
+        # 控制Socket的预分配接收缓冲区，避免每个数据报分配整块接收内存
+        self._ctrl_buf = bytearray(4096)
+        self._ctrl_mv = memoryview(self._ctrl_buf)
+        
+        # 主事件循环的selector（run中注册fd，广播线程在清理客户端时也会用到）
+        self._sel = selectors.DefaultSelector()
+        
+        # 控制命令的常驻工作线程池：复用线程避免每条命令的创建销毁开销，
+        # 并对命令洪峰限定并发上限
+        self._cmd_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix='gpio-cmd')
+        
         # 运行标志
         self.running = True
         
@@ -433,7 +511,7 @@ class GPIOControlDaemon:
     def handle_control_command(self, data, addr):
         """处理控制命令"""
         try:
-            command = json.loads(data.decode('utf-8'))
+            command = _json_loads(data)
             alias = command.get('alias')
             mode = command.get('mode')
             
@@ -458,7 +536,7 @@ class GPIOControlDaemon:
                     if hasattr(self, 'debug') and self.debug:
                         print(f"调试: 设置GPIO {gpio} 为 {value}")
                     
-                    controller.set_gpio({gpio: value})
+                    controller.set_gpio_one(gpio, value)
                 elif 'gpios' in command and 'values' in command:
                     # 批量GPIO控制
                     gpios = command['gpios']
@@ -511,65 +589,28 @@ class GPIOControlDaemon:
         """处理SPI队列中的任务"""
         while self.running:
             try:
-                # 等待SPI任务
-                spi_task = self.spi_queue.get(timeout=1.0)
-                
-                # 获取SPI配置中的延迟时间（配置文件中是毫秒，需要转换为秒）
-                controller_alias = spi_task['command']['alias']
-                controller_config = self.controller_configs[controller_alias]
-                try:
-                    lag_time_ms = float(controller_config.get('config', {}).get('lag_time', 1.0))  # 默认1毫秒
-                    if lag_time_ms <= 0:
-                        lag_time_ms = 1.0  # 确保延迟值为正数
-                except (ValueError, TypeError):
-                    lag_time_ms = 1.0  # 默认值
-                lag_time = lag_time_ms / 1000.0  # 转换为秒
+                # 等待SPI任务；拿到后把已积压的任务非阻塞取空，
+                # 整批任务只获取一次互斥锁，避免背靠背任务的锁竞争
+                batch = [self.spi_queue.get(timeout=1.0)]
+                while True:
+                    try:
+                        batch.append(self.spi_queue.get_nowait())
+                    except queue.Empty:
+                        break
                 
-                # 执行SPI操作时使用互斥锁，确保一次只执行一个SPI任务
+                # 执行SPI操作时使用互斥锁，确保SPI任务串行执行
                 with self.spi_processing_lock:
-                    command = spi_task['command']
-                    controller = spi_task['controller']
-                    
-                    # 获取共享的时钟和数据线
-                    clk_pin = controller_config['spi_pins'].get('clk')
-                    data_pin = controller_config['spi_pins'].get('data')
-                    
-                    if not clk_pin or not data_pin:
-                        print("错误: 未找到共享的clk或data引脚配置")
-                        continue
-                    
-                    if command['mode'] == 'spi':
-                        # 单路SPI通信
-                        spi_num = command.get('spi_num', 1)
-                        spi_data = command.get('spi_data', '')
-                        cs_collection = command.get('spi_data_cs_collection', 'down')
-                        
-                        # 根据spi_num获取对应的cs引脚
-                        cs_pin = controller_config['spi_pins'].get(f'cs_{spi_num}')
-                        
-                        if cs_pin:
-                            controller.set_spi(clk_pin, data_pin, cs_pin, spi_data, cs_collection, lag_time, self.debug_spi)
-                        else:
-                            print(f"错误: 未找到SPI接口{spi_num}的片选引脚配置")
-                    
-                    elif command['mode'] == 'spi_multi':
-                        # 多路SPI通信
-                        spis = command.get('spis', [])
-                        for spi_config in spis:
-                            spi_num = spi_config.get('spi_num', 1)
-                            spi_data = spi_config.get('spi_data', '')
-                            cs_collection = spi_config.get('spi_data_cs_collection', 'down')
-                            
-                            # 根据spi_num获取对应的cs引脚
-                            cs_pin = controller_config['spi_pins'].get(f'cs_{spi_num}')
-                            
-                            if cs_pin:
-                                controller.set_spi(clk_pin, data_pin, cs_pin, spi_data, cs_collection, lag_time, self.debug_spi)
-                            else:
-                                print(f"错误: 未找到SPI接口{spi_num}的片选引脚配置")
+                    for spi_task in batch:
+                        try:
+                            self._execute_spi_task(spi_task)
+                        except Exception as e:
+                            print(f"处理SPI任务时发生错误: {e}")
+                            import traceback
+                            traceback.print_exc()
                 
                 # 标记任务完成
-                self.spi_queue.task_done()
+                for _ in batch:
+                    self.spi_queue.task_done()
                 
             except queue.Empty:
                 # 队列为空，继续循环
@@ -579,75 +620,68 @@ class GPIOControlDaemon:
                 import traceback
                 traceback.print_exc()
     
+    def _execute_spi_task(self, spi_task):
+        """执行单个SPI任务（spi或spi_multi命令）"""
+        # 延迟时间在配置加载时已预解析为秒
+        controller_alias = spi_task['command']['alias']
+        controller_config = self.controller_configs[controller_alias]
+        lag_time = controller_config['lag_time_sec']
+        
+        command = spi_task['command']
+        controller = spi_task['controller']
+        
+        # 获取共享的时钟和数据线（配置加载时已预解析）
+        clk_pin, data_pin = controller_config['spi_clk_data']
+        
+        if not clk_pin or not data_pin:
+            print("错误: 未找到共享的clk或data引脚配置")
+            return
+        
+        if command['mode'] == 'spi':
+            # 单路SPI通信
+            spi_num = command.get('spi_num', 1)
+            spi_data = command.get('spi_data', '')
+            cs_collection = command.get('spi_data_cs_collection', 'down')
+            
+            # 根据spi_num获取对应的cs引脚
+            cs_pin = controller_config['spi_cs_pins'].get(spi_num)
+            
+            if cs_pin:
+                controller.set_spi(clk_pin, data_pin, cs_pin, spi_data, cs_collection, lag_time, self.debug_spi)
+            else:
+                print(f"错误: 未找到SPI接口{spi_num}的片选引脚配置")
+        
+        elif command['mode'] == 'spi_multi':
+            # 多路SPI通信
+            spis = command.get('spis', [])
+            for spi_config in spis:
+                spi_num = spi_config.get('spi_num', 1)
+                spi_data = spi_config.get('spi_data', '')
+                cs_collection = spi_config.get('spi_data_cs_collection', 'down')
+                
+                # 根据spi_num获取对应的cs引脚
+                cs_pin = controller_config['spi_cs_pins'].get(spi_num)
+                
+                if cs_pin:
+                    controller.set_spi(clk_pin, data_pin, cs_pin, spi_data, cs_collection, lag_time, self.debug_spi)
+                else:
+                    print(f"错误: 未找到SPI接口{spi_num}的片选引脚配置")
+    
     def start_spi_worker(self):
         """启动SPI工作线程"""
         self.spi_worker_thread = threading.Thread(target=self.process_spi_queue, daemon=True)
         self.spi_worker_thread.start()
         print("SPI工作线程已启动")
     
-    def handle_status_client(self, client_socket, client_addr):
-        """处理状态监听客户端"""
-        print(f"新的状态监听客户端连接: {client_addr}")
-        
-        with self.status_clients_lock:
-            self.status_clients.append(client_socket)
-        
-        try:
-            # 保持连接并处理客户端消息
-            while self.running:
-                # 尝试接收客户端消息（如ACK或查询请求）
-                try:
-                    client_socket.settimeout(1.0)  # 设置1秒超时
-                    data = client_socket.recv(1024)
-                    if not data:
-                        # 客户端断开连接
-                        break
-                    
-                    # 解析客户端发送的消息
-                    try:
-                        client_msg = json.loads(data.decode('utf-8'))
-                        
-                        # 处理ACK消息
-                        if client_msg.get('type') == 'ack':
-                            ack_id = client_msg.get('id')
-                            print(f"收到客户端ACK: {ack_id}")
-                            # 这里可以添加逻辑来跟踪已确认的消息
-                        
-                        # 处理状态查询请求
-                        elif client_msg.get('type') == 'query_status':
-                            # 发送当前所有GPIO状态
-                            current_status = self.get_current_gpio_status()
-                            client_socket.send(json.dumps(current_status).encode('utf-8'))
-                            
-                    except json.JSONDecodeError:
-                        # 不是JSON格式的消息，可能是其他协议
-                        pass
-                        
-                except socket.timeout:
-                    # 超时是正常的，继续循环
-                    continue
-                except Exception as e:
-                    # 连接可能已断开
-                    print(f"接收客户端消息时出错: {e}")
-                    break
-                    
-        except Exception as e:
-            print(f"状态监听客户端处理错误: {e}")
-        finally:
-            with self.status_clients_lock:
-                if client_socket in self.status_clients:
-                    self.status_clients.remove(client_socket)
-            try:
-                client_socket.close()
-            except:
-                pass
-            print(f"状态监听客户端断开: {client_addr}")
-    
     def start_gpio_monitoring(self):
         """启动GPIO状态监控线程"""
         # 初始化GPIO默认状态和上次状态
+        # 上次状态用16位整数位掩码表示（bit i对应GPIO i），
+        # 变化检测用一次XOR完成，代替逐引脚的字典查找和比较
         self.gpio_default_states = {}
         self.gpio_last_states = {}
+        # 记录每个引脚是否已经采集过（首次采样不算变化）
+        self.gpio_known_states = {}
         
         # 跟踪哪些geter控制器已经发送了持续上报指令
         self.gpio_reporting_active = set()
@@ -657,9 +691,11 @@ class GPIOControlDaemon:
             if config['mode'] == 'geter':
                 default_bit = int(config['config'].get('default_bit', 0))
                 self.gpio_default_states[alias] = default_bit
-                self.gpio_last_states[alias] = {}
+                self.gpio_last_states[alias] = 0
+                self.gpio_known_states[alias] = 0
         
-        # 为每个geter控制器启动单独的监听线程
+        # 收集真实geter控制器，统一由一个epoll线程监听
+        geter_controllers = []
         for alias, controller in self.controllers.items():
             if self.controller_configs[alias]['mode'] == 'geter':
                 default_bit = self.gpio_default_states.get(alias, 0)
@@ -690,17 +726,10 @@ class GPIOControlDaemon:
                     # 模拟模式下标记为已激活
                     self.gpio_reporting_active.add(alias)
                 
-                # 为每个geter控制器启动监听线程
+                # 真实设备交给共享epoll线程统一监听；模拟设备仍各自启动模拟线程
                 if not controller.simulate:
-                    # 启动监听线程
-                    listen_thread = threading.Thread(
-                        target=self.listen_gpio_controller,
-                        args=(alias, controller, default_bit),
-                        daemon=True
-                    )
-                    listen_thread.start()
+                    geter_controllers.append((alias, controller, default_bit))
                 else:
-                    # 模拟模式：启动模拟监听线程
                     simulate_thread = threading.Thread(
                         target=self.simulate_gpio_controller,
                         args=(alias, controller, default_bit),
@@ -708,112 +737,174 @@ class GPIOControlDaemon:
                     )
                     simulate_thread.start()
         
+        # 启动统一的epoll监听线程
+        if geter_controllers:
+            listen_thread = threading.Thread(
+                target=self.listen_gpio_controllers,
+                args=(geter_controllers,),
+                daemon=True
+            )
+            listen_thread.start()
+        
         # 主线程只负责处理缓冲区数据广播
+        # 用Event等待代替sleep轮询：超时表示到达发送间隔，
+        # 被提前唤醒则表示缓冲区积压需要立即发送
         while self.running:
             try:
-                # 检查是否需要发送缓冲区数据
-                current_time = time.time()
-                if current_time - self.gpio_change_buffer_last_send >= self.gpio_change_buffer_send_interval:
-                    self.send_buffered_gpio_status()
-                    self.gpio_change_buffer_last_send = current_time
-                    
-                    # 计算距离下一次发送的时间间隔
-                    time_since_last_send = time.time() - self.gpio_change_buffer_last_send
-                    wait_time = max(0.01, self.gpio_change_buffer_send_interval - time_since_last_send)
-                    time.sleep(wait_time)
-                else:
-                    # 距离下一次发送还有时间，等待剩余时间
-                    remaining_time = self.gpio_change_buffer_send_interval - (current_time - self.gpio_change_buffer_last_send)
-                    wait_time = max(0.01, remaining_time)
-                    time.sleep(wait_time)
-                
+                self.gpio_change_flush_event.wait(self.gpio_change_buffer_send_interval)
+                self.gpio_change_flush_event.clear()
+                self.send_buffered_gpio_status()
             except Exception as e:
                 print(f"GPIO监控主线程发生错误: {e}")
                 time.sleep(1)
     
-    def listen_gpio_controller(self, alias, controller, default_bit):
-        """监听单个GPIO控制器的数据上报"""
-        print(f"开始监听GPIO控制器: {alias}")
+    def listen_gpio_controllers(self, geter_controllers):
+        """用单个epoll实例监听所有geter控制器的数据上报
+        
+        相比每个控制器一个select线程，epoll只在内核中调度就绪的fd，
+        避免每次轮询时对fd列表的O(N)扫描和多余的线程切换
+        """
+        epoll = select.epoll()
+        fd_map = {}
+        for alias, controller, default_bit in geter_controllers:
+            fd = controller.ser.fileno()
+            epoll.register(fd, select.EPOLLIN | select.EPOLLET)
+            fd_map[fd] = (alias, controller, default_bit)
+            print(f"开始监听GPIO控制器: {alias}")
+        
+        # 读取失败的控制器进入重连队列，由本循环周期性重试：
+        # USB重插拔等较长时间的设备缺失不会让控制器永久掉出监听
+        pending_reconnects = []
+        next_retry = 0.0
         
         while self.running:
             try:
-                # 使用select来监听串口数据，避免轮询+sleep
-                # select会阻塞直到有数据可读
-                ready, _, _ = select.select([controller.ser], [], [], 0.1)
+                # 超时仅用于周期性检查running标志，放宽到1秒减少空转唤醒
+                events = epoll.poll(1.0)
+            except InterruptedError:
+                continue
+            
+            for fd, _event in events:
+                if fd not in fd_map:
+                    continue
+                alias, controller, default_bit = fd_map[fd]
+                try:
+                    self.read_gpio_reports(alias, controller, default_bit)
+                except Exception as e:
+                    print(f"监听GPIO控制器 {alias} 时发生错误: {e}")
+                    # 注销旧fd并排队重连，由下方的重试逻辑恢复监听
+                    try:
+                        epoll.unregister(fd)
+                    except Exception:
+                        pass
+                    del fd_map[fd]
+                    pending_reconnects.append((alias, controller, default_bit))
+            
+            # 周期性重试重连，成功后用新fd重新注册进epoll
+            if pending_reconnects and time.monotonic() >= next_retry:
+                still_pending = []
+                for alias, controller, default_bit in pending_reconnects:
+                    try:
+                        controller.reconnect()
+                        # 重连后需要重新发送持续上报指令
+                        self.gpio_reporting_active.discard(alias)
+                        new_fd = controller.ser.fileno()
+                        epoll.register(new_fd, select.EPOLLIN | select.EPOLLET)
+                        fd_map[new_fd] = (alias, controller, default_bit)
+                        print(f"GPIO控制器 {alias} 重连成功，恢复监听")
+                    except Exception:
+                        still_pending.append((alias, controller, default_bit))
+                pending_reconnects = still_pending
+                next_retry = time.monotonic() + 3.0
+        
+        epoll.close()
+    
+    def read_gpio_reports(self, alias, controller, default_bit):
+        """读取并解析单个GPIO控制器的上报数据（epoll就绪后调用）"""
+        # 边沿触发模式下必须把可读数据全部读完，否则不会再次触发
+        while True:
+            waiting = controller.ser.in_waiting
+            if not waiting:
+                break
+            response_data = controller.ser.read(waiting)
+            if not response_data:
+                break
+            
+            # 解析响应数据，格式为 "CH1:0 CH2:1 CH3:0 ..."
+            # 原始字节直接追加到缓冲区，换行符等噪声由正则匹配天然跳过
+            controller.data_buffer.extend(response_data)
+            
+            # 提取所有CHx:y格式的数据
+            # 增量扫描：只从上次解析结束的位置继续，新到的块不会导致
+            # 对整个累积缓冲区的重复扫描（随缓冲区增长会退化为平方开销）
+            # findall一次C层扫描取出全部(引脚,电平)对，不必为了拿到
+            # 最后一个match.end()而在Python层逐个迭代match对象
+            gpio_states = {}
+            pairs = _CH_RE.findall(controller.data_buffer, controller.parsed_offset)
+            if pairs:
+                for pin_bytes, bit_bytes in pairs:
+                    gpio_states[int(pin_bytes)] = int(bit_bytes)
                 
-                if ready:
-                    # 读取所有可用数据
-                    response_data = controller.ser.read(controller.ser.in_waiting)
-                    
-                    if response_data:
-                        # 解析响应数据，格式为 "CH1:0 CH2:1 CH3:0 ..."
-                        # 忽略换行符，将数据添加到缓冲区
-                        response_str = response_data.decode('ascii', errors='ignore')
-                        response_str = response_str.replace('\n', '').replace('\r', '').strip()
-                        
-                        # 将新数据添加到缓冲区
-                        controller.data_buffer += response_str
-                        
-                        # 提取所有CHx:y格式的数据
-                        import re
-                        matches = re.findall(r'CH(\d+):([01])', controller.data_buffer)
-                        
-                        if matches:
-                            gpio_states = {}
-                            for gpio_num, state in matches:
-                                gpio_num = int(gpio_num)
-                                state = int(state)
-                                gpio_states[gpio_num] = state
-                            
-                            # 更新当前GPIO状态（用于查询功能）
-                            if alias not in self.current_gpio_states:
-                                self.current_gpio_states[alias] = {}
-                            self.current_gpio_states[alias].update(gpio_states)
-                            
-                            # 清理缓冲区：移除已处理的数据，保留未完整的尾部数据
-                            # 使用正则找到最后一个完整匹配的位置
-                            last_match_end = 0
-                            for match in re.finditer(r'CH(\d+):([01])', controller.data_buffer):
-                                last_match_end = match.end()
-                            
-                            # 保留未处理的尾部数据（可能是被截断的"CH"等）
-                            if last_match_end > 0:
-                                controller.data_buffer = controller.data_buffer[last_match_end:]
-                        
-                            # 检查每个GPIO的状态变化
-                            for gpio_pin, current_state in gpio_states.items():
-                                last_state = self.gpio_last_states[alias].get(gpio_pin)
-                    
-                                if last_state is not None and last_state != current_state:
-                                    # 发现状态变化，广播给客户端
-                                    # default_bit表示配置的查询电平指令集类型（0=3E指令拉低检测，1=3D指令拉高检测）
-                                    status_data = {
-                                        "gpios": [
-                                            {
-                                                "alias": alias,
-                                                "default_bit": default_bit,
-                                                "change_gpio": [
-                                                    {
-                                                        "gpio": gpio_pin,
-                                                        "bit": current_state
-                                                    }
-                                                ]
-                                            }
-                                        ]
-                                    }
-                                    self.broadcast_gpio_status(status_data)
+                # 用rfind定位最后一个':'来推进解析偏移；若其后的电平位
+                # 还没到达（报告被截断）则保持原位，下次连同新数据重扫，
+                # 重复匹配在位掩码变化检测下没有副作用
+                last_colon = controller.data_buffer.rfind(b':', controller.parsed_offset)
+                if last_colon != -1 and last_colon + 1 < len(controller.data_buffer):
+                    controller.parsed_offset = last_colon + 2
+            
+            # 已解析数据积压到阈值时才整体裁剪，均摊内存搬移成本
+            # 尾部未匹配的数据（可能是被截断的"CH"等）始终保留
+            if controller.parsed_offset >= 4096:
+                del controller.data_buffer[:controller.parsed_offset]
+                controller.parsed_offset = 0
+            
+            if gpio_states:
+                # 更新当前GPIO状态（用于查询功能）
+                if alias not in self.current_gpio_states:
+                    self.current_gpio_states[alias] = {}
+                self.current_gpio_states[alias].update(gpio_states)
+                
+                # 位掩码变化检测：把本次采样写入掩码后，一次XOR找出所有变化位
+                last_mask = self.gpio_last_states[alias]
+                known_mask = self.gpio_known_states[alias]
+                current_mask = last_mask
+                sample_mask = 0
+                for gpio_pin, current_state in gpio_states.items():
+                    bit = 1 << gpio_pin
+                    sample_mask |= bit
+                    if current_state:
+                        current_mask |= bit
+                    else:
+                        current_mask &= ~bit
+                
+                self.gpio_last_states[alias] = current_mask
+                self.gpio_known_states[alias] = known_mask | sample_mask
+                
+                # 只对采集过的引脚报告变化（首次采样不算变化）
+                changed = (last_mask ^ current_mask) & known_mask
+                if changed:
+                    # 逐个取出变化位，合并成一条广播
+                    # default_bit表示配置的查询电平指令集类型（0=3E指令拉低检测，1=3D指令拉高检测）
+                    change_gpio = []
+                    while changed:
+                        bit = changed & -changed
+                        gpio_pin = bit.bit_length() - 1
+                        change_gpio.append({
+                            "gpio": gpio_pin,
+                            "bit": (current_mask >> gpio_pin) & 1
+                        })
+                        changed ^= bit
                     
-                                # 更新最后状态
-                                self.gpio_last_states[alias][gpio_pin] = current_state
-            except Exception as e:
-                print(f"监听GPIO控制器 {alias} 时发生错误: {e}")
-                # 尝试重新连接
-                try:
-                    controller.reconnect()
-                    # 重新发送持续上报指令
-                    self.gpio_reporting_active.discard(alias)
-                except:
-                    pass
+                    status_data = {
+                        "gpios": [
+                            {
+                                "alias": alias,
+                                "default_bit": default_bit,
+                                "change_gpio": change_gpio
+                            }
+                        ]
+                    }
+                    self.broadcast_gpio_status(status_data)
 
     def simulate_gpio_controller(self, alias, controller, default_bit):
         """模拟GPIO控制器的数据上报"""
@@ -823,105 +914,176 @@ class GPIOControlDaemon:
             # 模拟定期生成数据
             time.sleep(0.1)  # 模拟数据生成间隔
             
-            gpio_states = {}
-            for gpio_pin in range(1, 17):
-                current_state = random.randint(0, 1)
-                gpio_states[gpio_pin] = current_state
+            # 一次getrandbits(16)生成全部16个引脚的电平，
+            # 代替16次random.randint调用；左移1位即为引脚位掩码（bit i对应GPIO i）
+            bits = random.getrandbits(16)
+            gpio_states = {gpio_pin: (bits >> (gpio_pin - 1)) & 1 for gpio_pin in range(1, 17)}
             
             # 更新当前GPIO状态（用于查询功能）
             if alias not in self.current_gpio_states:
                 self.current_gpio_states[alias] = {}
             self.current_gpio_states[alias].update(gpio_states)
             
-            # 检查每个GPIO的状态变化
-            for gpio_pin, current_state in gpio_states.items():
-                last_state = self.gpio_last_states[alias].get(gpio_pin)
-                
-                if last_state is not None and last_state != current_state:
-                    status_data = {
-                        "gpios": [
-                            {
-                                "alias": alias,
-                                "default_bit": default_bit,
-                                "change_gpio": [
-                                    {
-                                        "gpio": gpio_pin,
-                                        "bit": current_state
-                                    }
-                                ]
-                            }
-                        ]
-                    }
-                    self.broadcast_gpio_status(status_data)
+            # 与真实控制器相同的位掩码变化检测
+            last_mask = self.gpio_last_states[alias]
+            known_mask = self.gpio_known_states[alias]
+            current_mask = bits << 1
+            sample_mask = 0x1FFFE  # GPIO 1-16对应的位
+            
+            self.gpio_last_states[alias] = current_mask
+            self.gpio_known_states[alias] = known_mask | sample_mask
+            
+            changed = (last_mask ^ current_mask) & known_mask
+            if changed:
+                change_gpio = []
+                while changed:
+                    bit = changed & -changed
+                    gpio_pin = bit.bit_length() - 1
+                    change_gpio.append({
+                        "gpio": gpio_pin,
+                        "bit": (current_mask >> gpio_pin) & 1
+                    })
+                    changed ^= bit
                 
-                # 更新最后状态
-                self.gpio_last_states[alias][gpio_pin] = current_state
+                status_data = {
+                    "gpios": [
+                        {
+                            "alias": alias,
+                            "default_bit": default_bit,
+                            "change_gpio": change_gpio
+                        }
+                    ]
+                }
+                self.broadcast_gpio_status(status_data)
     
     def get_next_message_id(self):
         """获取下一个消息ID"""
-        with self.message_id_lock:
-            self.message_id_counter += 1
-            return self.message_id_counter
+        return next(self.message_id_counter)
     
     def broadcast_gpio_status(self, status_data):
-        """将GPIO状态变化添加到缓冲区，稍后批量发送以避免JSON粘连"""
-        with self.gpio_change_buffer_lock:
-            # 从status_data中提取GPIO变化信息
-            for gpio_info in status_data.get('gpios', []):
-                alias = gpio_info.get('alias')
-                if alias not in self.gpio_change_buffer:
-                    self.gpio_change_buffer[alias] = []
-                
-                # 添加到缓冲区
-                self.gpio_change_buffer[alias].append(gpio_info)
+        """将GPIO状态变化放入变化队列，稍后批量发送以避免JSON粘连"""
+        ring = self.gpio_change_ring
+        # 从status_data中提取GPIO变化信息，压平成元组入队
+        for gpio_info in status_data.get('gpios', []):
+            alias = gpio_info.get('alias')
+            default_bit = gpio_info.get('default_bit', 0)
+            for change in gpio_info.get('change_gpio', []):
+                ring.put_nowait((alias, default_bit, change.get('gpio'), change.get('bit')))
+        
+        # 积压过多时提前唤醒广播线程
+        if ring.qsize() >= self.gpio_change_buffer_flush_threshold:
+            self.gpio_change_flush_event.set()
     
     def send_buffered_gpio_status(self):
-        """发送缓冲区中的GPIO状态变化"""
-        with self.gpio_change_buffer_lock:
-            if not self.gpio_change_buffer:
-                return  # 没有要发送的数据
-            
-            # 合并相同alias的GPIO变化
-            combined_status_data = {"gpios": []}
-            for alias, changes in self.gpio_change_buffer.items():
-                combined_changes = {
+        """发送变化队列中积累的GPIO状态变化"""
+        # 非阻塞排空队列，无需与生产者共享互斥锁
+        changes = []
+        while True:
+            try:
+                changes.append(self.gpio_change_ring.get_nowait())
+            except queue.Empty:
+                break
+        
+        if not changes:
+            return  # 没有要发送的数据
+        
+        # 合并相同alias的GPIO变化（使用每个alias第一个变化的default_bit）
+        combined = {}
+        for alias, default_bit, gpio_pin, bit in changes:
+            entry = combined.get(alias)
+            if entry is None:
+                entry = combined[alias] = {
                     "alias": alias,
-                    "default_bit": changes[0].get('default_bit', 0),  # 使用第一个的default_bit
+                    "default_bit": default_bit,
                     "change_gpio": []
                 }
-                
-                # 合并所有变化
-                for change in changes:
-                    combined_changes["change_gpio"].extend(change.get('change_gpio', []))
-                
-                combined_status_data["gpios"].append(combined_changes)
-            
-            # 清空缓冲区
-            self.gpio_change_buffer.clear()
+            entry["change_gpio"].append({"gpio": gpio_pin, "bit": bit})
         
+        gpios_list = list(combined.values())
+
         # 添加消息ID和类型
         message_id = self.get_next_message_id()
-        message_data = {
-            "type": "gpio_change",
-            "id": message_id,
-            "timestamp": time.time(),
-            **combined_status_data  # 展开GPIO数据
-        }
+        timestamp = time.time()
+
+        # 每个广播周期只序列化一次，所有客户端复用同一份编码结果
+        if self.status_serializer == 'msgpack':
+            # msgpack消息自带长度信息，无需额外分隔符
+            payload = msgpack.packb({
+                "type": "gpio_change",
+                "id": message_id,
+                "timestamp": timestamp,
+                "gpios": gpios_list
+            }, use_bin_type=True)
+        else:
+            # 外层结构固定，直接按模板拼接字节，只对变化列表做序列化，
+            # 省去组装外层字典和**展开合并的开销
+            # 末尾附加换行作为消息分隔符，方便客户端切分粘连的JSON
+            payload = (b'{"type":"gpio_change","id":%d,"timestamp":%.6f,"gpios":'
+                       % (message_id, timestamp)) + _json_dumps(gpios_list) + b'}\n'
         
-        # 发送合并后的数据
+        # 发送合并后的数据（客户端socket均为非阻塞，慢客户端不会卡住广播）
+        # 锁内只做一次快照拷贝，网络发送在锁外进行，
+        # 广播期间事件循环仍可接入新的状态监听客户端
         with self.status_clients_lock:
-            disconnected_clients = []
-            for client in self.status_clients:
-                try:
-                    client.send(json.dumps(message_data).encode('utf-8'))
-                except Exception as e:
-                    print(f"向客户端发送状态失败: {e}")
+            clients_snapshot = tuple(self.status_clients)
+        
+        disconnected_clients = []
+        for client in clients_snapshot:
+            try:
+                # 先补发上个周期部分写入留下的尾部，未清完前不能再发
+                # 新消息，否则字节流里会混进截断的半条JSON
+                backlog = self._client_send_backlogs.get(client)
+                if backlog:
+                    sent = client.send(backlog)
+                    if sent:
+                        del backlog[:sent]
+                    if backlog:
+                        # 尾部仍未清完：整条跳过本次消息（整条丢弃
+                        # 不破坏流的完整性），按失速累计一次
+                        stalls = self._client_stall_counts.get(client, 0) + 1
+                        self._client_stall_counts[client] = stalls
+                        if stalls >= self.client_stall_limit:
+                            print("状态监听客户端持续积压，判定为失速，断开连接")
+                            disconnected_clients.append(client)
+                        continue
+                    del self._client_send_backlogs[client]
+                
+                sent = client.send(payload)
+                if sent == len(payload):
+                    self._client_stall_counts.pop(client, None)
+                else:
+                    # 部分写入说明发送缓冲区已接近写满：留存未发送的
+                    # 尾部供下个周期补发，并按失速累计一次
+                    self._client_send_backlogs[client] = bytearray(payload[sent:])
+                    stalls = self._client_stall_counts.get(client, 0) + 1
+                    self._client_stall_counts[client] = stalls
+                    if stalls >= self.client_stall_limit:
+                        print("状态监听客户端持续积压，判定为失速，断开连接")
+                        disconnected_clients.append(client)
+            except BlockingIOError:
+                # 发送缓冲区已满：跳过本条消息，连续积压达到上限则踢除
+                stalls = self._client_stall_counts.get(client, 0) + 1
+                self._client_stall_counts[client] = stalls
+                if stalls >= self.client_stall_limit:
+                    print("状态监听客户端持续积压，判定为失速，断开连接")
                     disconnected_clients.append(client)
-            
-            # 移除断开的客户端
+            except Exception as e:
+                print(f"向客户端发送状态失败: {e}")
+                disconnected_clients.append(client)
+        
+        # 移除断开的客户端（短暂持锁过滤列表，同时从事件循环注销）
+        if disconnected_clients:
+            disconnected_set = set(disconnected_clients)
+            with self.status_clients_lock:
+                self.status_clients = [c for c in self.status_clients if c not in disconnected_set]
+                for client in disconnected_clients:
+                    self._client_stall_counts.pop(client, None)
+                    self._client_send_backlogs.pop(client, None)
             for client in disconnected_clients:
-                if client in self.status_clients:
-                    self.status_clients.remove(client)
+                try:
+                    self._sel.unregister(client)
+                except Exception:
+                    pass
                 try:
                     client.close()
                 except:
@@ -943,9 +1105,15 @@ class GPIOControlDaemon:
                 # 从current_gpio_states获取当前GPIO状态，如果为空则使用最后一次已知状态
                 current_gpio_states = self.current_gpio_states.get(alias, {}).copy()
                 
-                # 如果current_gpio_states为空，使用gpio_last_states作为备选
+                # 如果current_gpio_states为空，从位掩码形式的最后状态还原
                 if not current_gpio_states and alias in self.gpio_last_states:
-                    current_gpio_states = self.gpio_last_states[alias].copy()
+                    last_mask = self.gpio_last_states[alias]
+                    known = self.gpio_known_states.get(alias, 0)
+                    while known:
+                        bit = known & -known
+                        gpio_pin = bit.bit_length() - 1
+                        current_gpio_states[gpio_pin] = (last_mask >> gpio_pin) & 1
+                        known ^= bit
                 
                 current_status["gpios"].append({
                     "alias": alias,
@@ -955,20 +1123,83 @@ class GPIOControlDaemon:
         
         return current_status
     
-    def start_status_server(self):
-        """启动状态监听服务器"""
-        while self.running:
-            try:
-                client_socket, addr = self.status_socket.accept()
-                client_thread = threading.Thread(
-                    target=self.handle_status_client,
-                    args=(client_socket, addr),
-                    daemon=True
-                )
-                client_thread.start()
-            except Exception as e:
-                if self.running:  # 如果不是因为关闭导致的异常
-                    print(f"接受状态监听连接时发生错误: {e}")
+    def _on_control_ready(self, sock):
+        """控制Socket可读：读取并处理一条控制命令"""
+        # 接收进预分配缓冲区；命令交给线程处理前需拷贝出实际长度的快照，
+        # 否则下一个数据报会覆盖缓冲区
+        nbytes, _ancdata, _flags, addr = sock.recvmsg_into([self._ctrl_mv])
+        if nbytes:
+            data = bytes(self._ctrl_mv[:nbytes])
+            # 提交到常驻线程池处理，避免阻塞事件循环，也免去每条命令的建线程开销
+            self._cmd_pool.submit(self.handle_control_command, data, addr)
+    
+    def _on_status_accept(self, sock):
+        """状态监听Socket可读：接受新的客户端连接"""
+        try:
+            client_socket, addr = sock.accept()
+        except BlockingIOError:
+            return
+        print(f"新的状态监听客户端连接: {addr}")
+        
+        # 客户端设置为非阻塞并注册进事件循环，
+        # 不再为每个客户端开线程用1秒超时recv轮询
+        client_socket.setblocking(False)
+        with self.status_clients_lock:
+            self.status_clients.append(client_socket)
+        self._sel.register(client_socket, selectors.EVENT_READ, self._on_status_client_readable)
+    
+    def _on_status_client_readable(self, client_socket):
+        """状态监听客户端可读：处理ACK/查询消息或断开连接"""
+        try:
+            data = client_socket.recv(1024)
+        except BlockingIOError:
+            return
+        except Exception as e:
+            print(f"接收客户端消息时出错: {e}")
+            self._drop_status_client(client_socket)
+            return
+        
+        if not data:
+            # 客户端断开连接
+            self._drop_status_client(client_socket)
+            return
+        
+        # 解析客户端发送的消息
+        try:
+            client_msg = _json_loads(data)
+            
+            # 处理ACK消息
+            if client_msg.get('type') == 'ack':
+                ack_id = client_msg.get('id')
+                print(f"收到客户端ACK: {ack_id}")
+                # 这里可以添加逻辑来跟踪已确认的消息
+            
+            # 处理状态查询请求
+            elif client_msg.get('type') == 'query_status':
+                # 发送当前所有GPIO状态
+                current_status = self.get_current_gpio_status()
+                client_socket.send(_json_dumps(current_status))
+        
+        except json.JSONDecodeError:
+            # 不是JSON格式的消息，可能是其他协议
+            pass
+    
+    def _drop_status_client(self, client_socket):
+        """注销并关闭一个状态监听客户端"""
+        try:
+            self._sel.unregister(client_socket)
+        except Exception:
+            pass
+        with self.status_clients_lock:
+            if client_socket in self.status_clients:
+                self.status_clients.remove(client_socket)
+            self._client_stall_counts.pop(client_socket, None)
+            self._client_send_backlogs.pop(client_socket, None)
+        try:
+            client_socket.close()
+        except:
+            pass
+        print("状态监听客户端断开")
     
     def run(self):
         """运行守护进程"""
@@ -977,31 +1208,21 @@ class GPIOControlDaemon:
         # 启动SPI工作线程
         self.start_spi_worker()
         
-        # 启动状态监听服务器线程
-        status_thread = threading.Thread(target=self.start_status_server, daemon=True)
-        status_thread.start()
-        
         # 启动GPIO监控线程
         gpio_monitor_thread = threading.Thread(target=self.start_gpio_monitoring, daemon=True)
         gpio_monitor_thread.start()
         
-        # 主循环 - 处理控制命令
+        # 主循环 - 用单个selectors事件循环统一处理控制命令和状态监听连接
+        # DefaultSelector在Linux上使用epoll，就绪分发不随fd数量线性变慢，
+        # 也省掉了独立的状态监听accept线程
+        self._sel.register(self.control_socket, selectors.EVENT_READ, self._on_control_ready)
+        self._sel.register(self.status_socket, selectors.EVENT_READ, self._on_status_accept)
+        
         while self.running:
             try:
-                # 使用select来实现非阻塞的socket监听
-                ready_sockets, _, _ = select.select([self.control_socket], [], [], 1.0)
-                
-                for sock in ready_sockets:
-                    if sock == self.control_socket:
-                        data, addr = sock.recvfrom(1024)
-                        if data:
-                            # 使用线程处理命令，避免阻塞主循环
-                            command_thread = threading.Thread(
-                                target=self.handle_control_command,
-                                args=(data, addr),
-                                daemon=True
-                            )
-                            command_thread.start()
+                events = self._sel.select(1.0)
+                for key, _ in events:
+                    key.data(key.fileobj)
             
             except KeyboardInterrupt:
                 print("接收到中断信号")
@@ -1017,6 +1238,18 @@ class GPIOControlDaemon:
         print("正在停止GPIO守护进程...")
         self.running = False
         
+        # 关闭事件循环的selector
+        try:
+            self._sel.close()
+        except Exception:
+            pass
+        
+        # 等待在途控制命令处理完毕后关闭线程池
+        try:
+            self._cmd_pool.shutdown(wait=True)
+        except Exception:
+            pass
+        
         # 等待SPI队列中的所有任务完成
         try:
             self.spi_queue.join()  # 等待所有队列任务完成
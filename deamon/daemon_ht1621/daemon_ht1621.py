@@ -5,6 +5,7 @@ HT1621抽象层守护进程
 """
 
 import json
+import pickle
 import socket
 import threading
 import time
@@ -21,14 +22,62 @@ class HT1621Daemon:
         self.config = configparser.ConfigParser()
         # 设置选项名称保持原样（区分大小写）
         self.config.optionxform = str
-        self.config.read(config_path)
         
-        self.gpio_socket_path = self.config.get('daemon_config', 'gpio_socket_path', fallback='/tmp/gpio.sock')
-        self.ht1621_socket_path = self.config.get('daemon_config', 'ht1621_socket_path', fallback='/tmp/ht1621.sock')
         self.running = True
         self.debug = debug  # 添加调试标志
         self.debug_in = debug_in  # 添加传入参数调试标志
         
+        # 优先从pickle缓存加载解析好的配置（按INI的mtime判断是否失效），
+        # 守护进程重启频繁时可完全跳过configparser解析
+        cache_path = config_path + '.cache'
+        if not self._load_config_cache(config_path, cache_path):
+            self._parse_config(config_path)
+            self._save_config_cache(config_path, cache_path)
+        
+        # 初始化GPIO Socket
+        # connect一次让内核缓存对端地址，之后用send()发送，
+        # 免去sendto每次的路径解析；GPIO守护进程可能尚未启动，
+        # 失败时延后到首次发送前再重试
+        self.gpio_sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._gpio_connected = False
+        self._connect_gpio_sock()
+        
+        # RAM写入命令前缀表：地址域只有6个固定取值，启动时一次算好
+        self._ram_cmd_prefix = {}
+        for addr in self.ram_addresses:
+            self._ram_cmd_prefix[addr] = "101" + format(addr, '06b')
+        
+        # 完整JSON命令字节缓存：地址和段码都来自很小的固定集合，
+        # 按(device_id, 地址, 数据)记忆化后热路径只剩字典查找+sendto
+        self._ram_cmd_cache = {}
+        
+        # 初始化序列、清屏序列与9位命令同样是固定输入，编码结果各自缓存复用
+        self._init_cmd_cache = {}
+        self._clear_cmd_cache = {}
+        self._cmd9_cache = {}
+        
+        # 256项字符→段码查找表（按ord(char)下标），未定义字符显示空白。
+        # display_data热路径由此免去upper()调用和对段码表的多次in判断
+        blank_seg = self.digit_to_segments.get('space', '00000000')
+        self._char_to_seg = [blank_seg] * 256
+        self._char_to_seg[ord(' ')] = blank_seg
+        for key, seg in self.digit_to_segments.items():
+            if len(key) != 1:
+                continue  # 'space'等命名键不参与按字符下标
+            self._char_to_seg[ord(key)] = seg
+        # 与原有回退逻辑一致：小写输入在自身无定义时回退到大写段码
+        # （'C'和'c'是不同字符，已定义的小写键不会被覆盖）
+        for key, seg in self.digit_to_segments.items():
+            if len(key) == 1 and key.isupper() and key.lower() not in self.digit_to_segments:
+                self._char_to_seg[ord(key.lower())] = seg
+    
+    def _parse_config(self, config_path):
+        """用configparser解析INI配置文件"""
+        self.config.read(config_path)
+        
+        self.gpio_socket_path = self.config.get('daemon_config', 'gpio_socket_path', fallback='/tmp/gpio.sock')
+        self.ht1621_socket_path = self.config.get('daemon_config', 'ht1621_socket_path', fallback='/tmp/ht1621.sock')
+        
         # 从配置文件读取段码表 (从font_data段)
         self.digit_to_segments = {}
         for key in self.config.options('font_data'):
@@ -62,23 +111,108 @@ class HT1621Daemon:
                 # 解析格式: alias:spi_interface_id
                 alias, spi_interface_id = mapping_str.split(':')
                 self.device_mapping[device_id] = (alias, int(spi_interface_id))
+    
+    def _load_config_cache(self, config_path, cache_path):
+        """尝试从pickle缓存恢复解析结果，成功返回True
         
-        # 初始化GPIO Socket
-        self.gpio_sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        缓存中记录了生成时INI的mtime，INI被修改后缓存自动失效
+        """
+        try:
+            with open(cache_path, 'rb') as f:
+                cached = pickle.load(f)
+            if cached.get('ini_mtime') != os.path.getmtime(config_path):
+                return False
+            
+            self.gpio_socket_path = cached['gpio_socket_path']
+            self.ht1621_socket_path = cached['ht1621_socket_path']
+            self.digit_to_segments = cached['digit_to_segments']
+            self.ram_addresses = cached['ram_addresses']
+            self.init_commands_data = cached['init_commands_data']
+            self.device_mapping = cached['device_mapping']
+            return True
+        except (OSError, pickle.PickleError, EOFError, KeyError):
+            return False
+    
+    def _save_config_cache(self, config_path, cache_path):
+        """把解析好的配置写入pickle缓存（失败不影响启动）"""
+        try:
+            cached = {
+                'ini_mtime': os.path.getmtime(config_path),
+                'gpio_socket_path': self.gpio_socket_path,
+                'ht1621_socket_path': self.ht1621_socket_path,
+                'digit_to_segments': self.digit_to_segments,
+                'ram_addresses': self.ram_addresses,
+                'init_commands_data': self.init_commands_data,
+                'device_mapping': self.device_mapping,
+            }
+            with open(cache_path, 'wb') as f:
+                pickle.dump(cached, f)
+        except OSError:
+            pass
+    
+    def _connect_gpio_sock(self):
+        """连接GPIO socket（数据报socket的connect只记录对端地址）"""
+        try:
+            self.gpio_sock.connect(self.gpio_socket_path)
+            self._gpio_connected = True
+        except OSError:
+            self._gpio_connected = False
+        return self._gpio_connected
     
     def send_to_gpio(self, data):
         """发送数据到GPIO守护进程"""
+        return self.send_raw_to_gpio(data.encode('utf-8'))
+    
+    def send_raw_to_gpio(self, payload):
+        """发送已编码好的命令字节到GPIO守护进程"""
         # 调试：打印发送的数据
-        if hasattr(self, 'debug') and self.debug:
-            print(f"调试: 发送到GPIO守护进程 - {data}")
+        if self.debug:
+            print(f"调试: 发送到GPIO守护进程 - {payload.decode('utf-8')}")
         
         try:
-            self.gpio_sock.sendto(data.encode('utf-8'), self.gpio_socket_path)
+            if not self._gpio_connected and not self._connect_gpio_sock():
+                # 对端尚未就绪，退回按路径sendto
+                self.gpio_sock.sendto(payload, self.gpio_socket_path)
+            else:
+                self.gpio_sock.send(payload)
             return True
         except Exception as e:
+            # GPIO守护进程重启会使已connect的对端失效，重连后重试一次
+            self._gpio_connected = False
+            try:
+                if self._connect_gpio_sock():
+                    self.gpio_sock.send(payload)
+                    return True
+            except Exception:
+                pass
             print(f"发送到GPIO守护进程失败: {e}")
             return False
     
+    def build_spi_multi_cmd(self, device_id, frames):
+        """构建包含多个SPI帧的spi_multi命令，返回编码好的JSON字节"""
+        alias, spi_interface_id = self.device_mapping[device_id]
+        cmd = {
+            "alias": alias,
+            "mode": "spi_multi",
+            "spis": [
+                {
+                    "spi_num": spi_interface_id,
+                    "spi_data_cs_collection": "down",
+                    "spi_data": frame
+                }
+                for frame in frames
+            ]
+        }
+        return json.dumps(cmd).encode('utf-8')
+    
+    def send_spi_multi_to_gpio(self, device_id, frames):
+        """把多个SPI帧打包成一条spi_multi命令发送
+        
+        GPIO守护进程按spis数组顺序逐帧执行，一次sendto即可完成
+        整个序列，避免逐帧序列化和逐帧系统调用的开销
+        """
+        return self.send_raw_to_gpio(self.build_spi_multi_cmd(device_id, frames))
+    
     def init_ht1621(self, device_id):
         """初始化HT1621"""
         if device_id not in self.device_mapping:
@@ -97,17 +231,13 @@ class HT1621Daemon:
             "000000110"   # LCDON: 打开显示输出
         ]
         
-        # 发送初始化序列
-        for cmd9 in init_commands:
-            frame = "100" + cmd9  # HT1621命令格式：100 + 9位命令
-            cmd = {
-                "alias": alias,
-                "mode": "spi", 
-                "spi_num": spi_interface_id,
-                "spi_data_cs_collection": "down", 
-                "spi_data": frame
-            }
-            self.send_to_gpio(json.dumps(cmd))
+        # 初始化序列打包成一条spi_multi命令发送（HT1621命令格式：100 + 9位命令）
+        # 序列每台设备固定不变，整条命令的编码结果只构建一次
+        payload = self._init_cmd_cache.get(device_id)
+        if payload is None:
+            payload = self.build_spi_multi_cmd(device_id, ["100" + cmd9 for cmd9 in init_commands])
+            self._init_cmd_cache[device_id] = payload
+        self.send_raw_to_gpio(payload)
         
         # 初始化完成后，清除所有显示
         self.clear_display(device_id)
@@ -121,11 +251,15 @@ class HT1621Daemon:
             print(f"错误: 未找到device_id {device_id}的映射配置")
             return False
             
-        # 清除所有RAM地址的显示（写入0x00）
-        for ram_address in self.ram_addresses:
-            self.write_ram_to_ht1621(device_id, ram_address, "00000000")
-        
-        return True
+        # 清除所有RAM地址的显示（写入0x00），6个地址合并为一条spi_multi命令
+        # 清屏帧每台设备固定不变，整条命令的编码结果只构建一次
+        payload = self._clear_cmd_cache.get(device_id)
+        if payload is None:
+            frames = [self._ram_cmd_prefix[ram_address] + "00000000"
+                      for ram_address in self.ram_addresses]
+            payload = self.build_spi_multi_cmd(device_id, frames)
+            self._clear_cmd_cache[device_id] = payload
+        return self.send_raw_to_gpio(payload)
     
     def write_ram_to_ht1621(self, device_id, address, data):
         """写RAM到HT1621"""
@@ -133,26 +267,34 @@ class HT1621Daemon:
             print(f"错误: 未找到device_id {device_id}的映射配置")
             return False
             
-        alias, spi_interface_id = self.device_mapping[device_id]
-        
-        # RAM写入命令格式: 101 + 6位地址 + 8位数据
-        address_bin = format(address, '06b')  # 6位地址
-        data_bin = data  # 8位数据 (已经是8位二进制字符串)
-        command = f"101{address_bin}{data_bin}"
-        
-        cmd = {
-            "alias": alias,  # 使用映射的设备别名
-            "mode": "spi", 
-            "spi_num": spi_interface_id,  # 使用映射的SPI接口ID
-            "spi_data_cs_collection": "down", 
-            "spi_data": command
-        }
+        # 命中缓存时直接复用编码好的JSON字节，跳过格式化和序列化
+        cache_key = (device_id, address, data)
+        payload = self._ram_cmd_cache.get(cache_key)
+        if payload is None:
+            alias, spi_interface_id = self.device_mapping[device_id]
+            
+            # RAM写入命令格式: 101 + 6位地址 + 8位数据
+            prefix = self._ram_cmd_prefix.get(address)
+            if prefix is None:
+                prefix = "101" + format(address, '06b')  # 6位地址
+                self._ram_cmd_prefix[address] = prefix
+            command = prefix + data  # data已经是8位二进制字符串
+            
+            cmd = {
+                "alias": alias,  # 使用映射的设备别名
+                "mode": "spi", 
+                "spi_num": spi_interface_id,  # 使用映射的SPI接口ID
+                "spi_data_cs_collection": "down", 
+                "spi_data": command
+            }
+            payload = json.dumps(cmd).encode('utf-8')
+            self._ram_cmd_cache[cache_key] = payload
         
         # 如果启用了debug_in，则打印SPI数据
         if self.debug_in:
-            print(f"调试输入: 发送SPI数据 - 设备ID: {device_id}, 地址: {address}, 数据: {data}, 命令: {command}")
+            print(f"调试输入: 发送SPI数据 - 设备ID: {device_id}, 地址: {address}, 数据: {data}")
         
-        return self.send_to_gpio(json.dumps(cmd))
+        return self.send_raw_to_gpio(payload)
     
     def send_command_to_ht1621(self, device_id, command_9bit):
         """发送9位命令到HT1621
@@ -165,24 +307,30 @@ class HT1621Daemon:
             print(f"错误: 未找到device_id {device_id}的映射配置")
             return False
             
-        alias, spi_interface_id = self.device_mapping[device_id]
-        
-        # 命令格式: 100 + 9位命令
-        full_command = f"100{command_9bit}"
-        
-        cmd = {
-            "alias": alias,
-            "mode": "spi",
-            "spi_num": spi_interface_id,
-            "spi_data_cs_collection": "down",
-            "spi_data": full_command
-        }
+        # 9位命令种类有限，同样缓存编码好的JSON字节
+        cache_key = (device_id, command_9bit)
+        payload = self._cmd9_cache.get(cache_key)
+        if payload is None:
+            alias, spi_interface_id = self.device_mapping[device_id]
+            
+            # 命令格式: 100 + 9位命令
+            full_command = f"100{command_9bit}"
+            
+            cmd = {
+                "alias": alias,
+                "mode": "spi",
+                "spi_num": spi_interface_id,
+                "spi_data_cs_collection": "down",
+                "spi_data": full_command
+            }
+            payload = json.dumps(cmd).encode('utf-8')
+            self._cmd9_cache[cache_key] = payload
         
         # 如果启用了debug_in，则打印命令
         if self.debug_in:
-            print(f"调试输入: 发送HT1621命令 - 设备ID: {device_id}, 9位命令: {command_9bit}, 完整命令: {full_command}")
+            print(f"调试输入: 发送HT1621命令 - 设备ID: {device_id}, 9位命令: {command_9bit}")
         
-        return self.send_to_gpio(json.dumps(cmd))
+        return self.send_raw_to_gpio(payload)
     
     def lcd_display_on(self, device_id):
         """打开LCD显示输出
@@ -236,42 +384,25 @@ class HT1621Daemon:
         if self.debug_in:
             print(f"调试输入: 显示数据处理 - 设备ID: {device_id}, 原始数据: {display_data}, 填充后: {padded_data}")
         
-        # 写入每个字符到对应的RAM地址
+        # 写入每个字符到对应的RAM地址，6帧合并为一条spi_multi命令发送
         # 修复显示方向问题：字符顺序需要反向映射到RAM地址
         # 例如：输入"Err404"应该正常显示，而不是显示为"404rrE"
+        frames = []
         for i, char in enumerate(padded_data):
-            # 查找字符的段码，首先尝试原始字符，然后尝试转为大写（保持向后兼容性）
-            segment_key = None
-            if char in self.digit_to_segments:
-                segment_key = char
-            elif char.upper() in self.digit_to_segments:
-                segment_key = char.upper()
-            elif char == ' ':  # 处理空格
-                segment_key = 'space'
+            # 预计算的256项查找表一步取得段码（含大小写兼容和空白回退）
+            segment_data = self._char_to_seg[ord(char) & 0xFF]
             
-            if segment_key and segment_key in self.digit_to_segments:
-                segment_data = self.digit_to_segments[segment_key]
-                # 反向映射：将第一个字符映射到最后一个RAM地址，最后一个字符映射到第一个RAM地址
-                ram_address_index = len(self.ram_addresses) - 1 - i
-                ram_address = self.ram_addresses[ram_address_index] if ram_address_index >= 0 else self.ram_addresses[0]
-                
-                # 如果启用了debug_in，则打印字符处理过程
-                if self.debug_in:
-                    print(f"调试输入: 处理字符 - 位置: {i}, 字符: '{char}', RAM地址: {ram_address}, 段码: {segment_data}")
-                
-                self.write_ram_to_ht1621(device_id, ram_address, segment_data)
-            else:
-                # 如果字符不在段码表中，显示为空白
-                ram_address_index = len(self.ram_addresses) - 1 - i
-                ram_address = self.ram_addresses[ram_address_index] if ram_address_index >= 0 else self.ram_addresses[0]
-                
-                # 如果启用了debug_in，则打印未知字符处理过程
-                if self.debug_in:
-                    print(f"调试输入: 未知字符 - 位置: {i}, 字符: '{char}', RAM地址: {ram_address}, 段码: 空白")
-                
-                self.write_ram_to_ht1621(device_id, ram_address, self.digit_to_segments.get('space', '00000000'))
+            # 反向映射：将第一个字符映射到最后一个RAM地址，最后一个字符映射到第一个RAM地址
+            ram_address_index = len(self.ram_addresses) - 1 - i
+            ram_address = self.ram_addresses[ram_address_index] if ram_address_index >= 0 else self.ram_addresses[0]
+            
+            # 如果启用了debug_in，则打印字符处理过程
+            if self.debug_in:
+                print(f"调试输入: 处理字符 - 位置: {i}, 字符: '{char}', RAM地址: {ram_address}, 段码: {segment_data}")
+            
+            frames.append(self._ram_cmd_prefix[ram_address] + segment_data)
         
-        return True
+        return self.send_spi_multi_to_gpio(device_id, frames)
     
     def handle_client_command(self, data):
         """处理客户端命令"""
@@ -371,14 +502,20 @@ class HT1621Daemon:
         print(f"连接到GPIO守护进程: {self.gpio_socket_path}")
         
         # 等待GPIO守护进程准备就绪
+        # 指数退避轮询：从10毫秒开始逐次翻倍到1秒，总等待上限仍为10秒。
+        # GPIO守护进程通常在几十毫秒内就绪，固定1秒间隔会白等近一秒
         print("等待GPIO守护进程准备就绪...")
-        for attempt in range(10):  # 最多尝试10次
-            if os.path.exists(self.gpio_socket_path):
-                print("GPIO守护进程已准备就绪")
+        wait_interval = 0.01
+        waited = 0.0
+        while not os.path.exists(self.gpio_socket_path):
+            if waited >= 10.0:
+                print("警告: 无法连接到GPIO守护进程，但继续启动")
                 break
-            time.sleep(1)
+            time.sleep(wait_interval)
+            waited += wait_interval
+            wait_interval = min(wait_interval * 2, 1.0)
         else:
-            print("警告: 无法连接到GPIO守护进程，但继续启动")
+            print("GPIO守护进程已准备就绪")
         
         # 强制重新初始化所有已配置的设备
         print("开始初始化所有HT1621设备...")
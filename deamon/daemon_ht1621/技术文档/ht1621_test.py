@@ -4,20 +4,53 @@ HT1621测试脚本
 用于验证HT1621通信是否正常
 """
 
+import os
 import serial
 import time
 import sys
 
+# 数字0-9对应的段码 (共阴数码管)，模块级常量避免每次调用重建字典
+_DIGIT_TO_SEGMENTS = {
+    0: 0b01111101,  # 二进制 01111101 = 十进制 125 = 十六进制 0x7D
+    1: 0b01100000,  # 二进制 01100000 = 十进制 96 = 十六进制 0x60
+    2: 0b00111110,  # 二进制 00111110 = 十进制 62 = 十六进制 0x3E
+    3: 0b01111010,  # 二进制 01111010 = 十进制 122 = 十六进制 0x7A
+    4: 0b01100011,  # 二进制 01100011 = 十进制 99 = 十六进制 0x63
+    5: 0b01011011,  # 二进制 01011011 = 十进制 91 = 十六进制 0x5B
+    6: 0b01011111,  # 二进制 01011111 = 十进制 95 = 十六进制 0x5F
+    7: 0b01110000,  # 二进制 01110000 = 十进制 112 = 十六进制 0x70
+    8: 0b01111111,  # 二进制 01111111 = 十进制 127 = 十六进制 0x7F
+    9: 0b01111011,  # 二进制 01111011 = 十进制 123 = 十六进制 0x7B
+}
+
+# RAM地址: 0,2,4,6,8,10 对应数码管的 位0-位5
+# 每个RAM地址间隔2（因为每个RAM只有4个数据位，一个段码需要2个地址）
+_RAM_ADDRESSES = (0, 2, 4, 6, 8, 10)
+
+# (位置, 数字) -> 完整write_ram帧位序列，导入时全部展开，
+# 显示热路径只剩两级下标访问，不再逐位移位提取
+_SEGMENT_FRAME_BITS = tuple(
+    tuple(
+        tuple([1, 0, 1]
+              + [(addr >> i) & 1 for i in range(5, -1, -1)]
+              + [(_DIGIT_TO_SEGMENTS[digit] >> i) & 1 for i in range(7, -1, -1)])
+        for digit in range(10)
+    )
+    for addr in _RAM_ADDRESSES
+)
+
 
 class HT1621TestController:
-    def __init__(self, device_path='/dev/ttyUSB0', baud_rate=115200):
+    def __init__(self, device_path='/dev/ttyUSB0', baud_rate=115200, verbose=False):
         """
         初始化HT1621控制器
         :param device_path: USB2GPIO设备路径
         :param baud_rate: 波特率
+        :param verbose: 打印每位数字的帧细节（格式化开销不小，默认关闭）
         """
         self.device_path = device_path
         self.baud_rate = baud_rate
+        self.verbose = verbose
         self.ser = None
         
         # GPIO引脚定义
@@ -30,6 +63,36 @@ class HT1621TestController:
         except Exception as e:
             print(f"错误: 无法连接到设备 {self.device_path}: {e}", file=sys.stderr)
             sys.exit(1)
+        
+        # 降低USB串口的延迟定时器：FTDI/CH340默认16ms才冲刷一次URB，
+        # 对本脚本这种小包交互，每次write都会白等这段合并窗口
+        self._enable_low_latency()
+        
+        # 预分配的发送缓冲区：命令都写进同一块bytearray再以memoryview发出，
+        # 热路径上不再为每帧分配和拷贝新的字节对象
+        self._tx_buf = bytearray(512)
+        
+        # 帧位序列 -> 完整线上字节串的缓存：引脚号是固定常量，
+        # 同一帧的字节组装只做一次，之后重显数字只剩字典查找和write
+        # （可显示的帧总共几十种，缓存不会无界增长）
+        self._frame_cache = {}
+    
+    def _enable_low_latency(self):
+        """尽量把USB串口延迟定时器降到1ms，失败时静默保持默认值"""
+        tty_name = os.path.basename(self.device_path)
+        sysfs_path = f"/sys/bus/usb-serial/devices/{tty_name}/latency_timer"
+        try:
+            with open(sysfs_path, 'w') as f:
+                f.write('1')
+            return
+        except OSError:
+            pass
+        
+        # sysfs不可写时退回ASYNC_LOW_LATENCY标志（pyserial封装了该ioctl）
+        try:
+            self.ser.set_low_latency_mode(True)
+        except Exception:
+            pass
     
     def close(self):
         if self.ser and self.ser.is_open:
@@ -40,11 +103,15 @@ class HT1621TestController:
         发送GPIO设置命令
         :param gpio_states: GPIO状态字典 {pin: state, ...}
         """
-        command = bytearray([0x3A])
+        buf = self._tx_buf
+        buf[0] = 0x3A
+        end = 1
         for gpio_pin, state in gpio_states.items():
-            command.append(gpio_pin)
-            command.append(state)
-        self.ser.write(bytes(command))
+            buf[end] = gpio_pin
+            buf[end + 1] = state
+            end += 2
+        # pyserial接受memoryview且不会再拷贝
+        self.ser.write(memoryview(buf)[:end])
     
     def set_gpio(self, pin, state):
         """
@@ -58,20 +125,64 @@ class HT1621TestController:
         """
         发送帧数据
         :param frame_bits: 帧数据位列表
+        
+        整帧的全部电平操作拼成一串0x3A命令后一次性写入串口：
+        逐位三次write的耗时主要花在USB往返延迟上，合并后一帧
+        只需一次USB事务，数字刷新从每位约3次往返降为每帧1次
         """
+        key = frame_bits if type(frame_bits) is tuple else tuple(frame_bits)
+        payload = self._frame_cache.get(key)
+        if payload is None:
+            payload = self._frame_cache[key] = self._build_frame(key)
+        self.ser.write(payload)
+        # 不再sleep(0.001)：内核会把它凑整到调度节拍（常见4ms），
+        # HT1621的CS恢复时间只有几微秒，USB帧间隔本身已绰绰有余
+    
+    def _build_frame(self, frame_bits):
+        """把帧位序列组装为完整的0x3A命令字节串（仅在缓存未命中时调用）"""
+        buf = self._tx_buf
+        needed = 6 + 8 * len(frame_bits)
+        if len(buf) < needed:
+            buf = self._tx_buf = bytearray(needed)
+        
         # 拉低CS，开始传输
-        self.set_gpio(self.CS_PIN, 0)
+        buf[0] = 0x3A
+        buf[1] = self.CS_PIN
+        buf[2] = 0
+        end = 3
         
+        data_pin = self.DATA_PIN
+        wr_pin = self.WR_PIN
+        # DATA电平与前一位相同时无需重写，该位只剩WR的低/高脉冲，
+        # 连续相同位从8字节压到6字节（段码里成串的0/1很常见）
+        prev_bit = None
         for bit in frame_bits:
-            # 设置数据位
-            self.set_gpio(self.DATA_PIN, bit)
-            # WR下降沿采样
-            self.set_gpio(self.WR_PIN, 0)
-            self.set_gpio(self.WR_PIN, 1)  # 拉高WR
+            if bit != prev_bit:
+                # 数据位与WR拉低合并进同一条命令，WR拉高单独成对产生采样边沿
+                buf[end] = 0x3A
+                buf[end + 1] = data_pin
+                buf[end + 2] = bit
+                buf[end + 3] = wr_pin
+                buf[end + 4] = 0
+                end += 5
+                prev_bit = bit
+            else:
+                buf[end] = 0x3A
+                buf[end + 1] = wr_pin
+                buf[end + 2] = 0
+                end += 3
+            buf[end] = 0x3A
+            buf[end + 1] = wr_pin
+            buf[end + 2] = 1
+            end += 3
         
         # 拉高CS，结束并应用
-        self.set_gpio(self.CS_PIN, 1)
-        time.sleep(0.001)  # 短暂延迟
+        buf[end] = 0x3A
+        buf[end + 1] = self.CS_PIN
+        buf[end + 2] = 1
+        end += 3
+        
+        return bytes(memoryview(buf)[:end])
     
     def send_command(self, cmd9):
         """
@@ -130,30 +241,15 @@ class HT1621TestController:
         :param digit: 要显示的数字 (0-9)
         :param position: 显示位置 (0-5)
         """
-        # 数字对应的段码 (共阴数码管)
-        digit_to_segments = {
-            0: 0b01111101,  # 二进制 01111101 = 十进制 125 = 十六进制 0x7D
-            1: 0b01100000,  # 二进制 01100000 = 十进制 96 = 十六进制 0x60
-            2: 0b00111110,  # 二进制 00111110 = 十进制 62 = 十六进制 0x3E
-            3: 0b01111010,  # 二进制 01111010 = 十进制 122 = 十六进制 0x7A
-            4: 0b01100011,  # 二进制 01100011 = 十进制 99 = 十六进制 0x63
-            5: 0b01011011,  # 二进制 01011011 = 十进制 91 = 十六进制 0x5B
-            6: 0b01011111,  # 二进制 01011111 = 十进制 95 = 十六进制 0x5F
-            7: 0b01110000,  # 二进制 01110000 = 十进制 112 = 十六进制 0x70
-            8: 0b01111111,  # 二进制 01111111 = 十进制 127 = 十六进制 0x7F
-            9: 0b01111011,  # 二进制 01111011 = 十进制 123 = 十六进制 0x7B
-        }
-        
-        if digit not in digit_to_segments:
+        if digit not in _DIGIT_TO_SEGMENTS:
             print(f"错误: 数字 {digit} 不在有效范围内 (0-9)")
             return
         
-        # 计算RAM地址 (每个数字需要2个RAM地址，地址间隔2)
-        ram_address = position * 2  # 0, 2, 4, 6, 8, 10 对应 6个数码管位
-        
-        segment_data = digit_to_segments[digit]
-        print(f"在位置 {position} 显示数字 {digit} (RAM地址 {ram_address}, 段码 {bin(segment_data)})")
-        self.write_ram(ram_address, segment_data)
+        # 每位的bin()/f-string格式化和stdout写入在ARM上开销可观，仅verbose时输出
+        if self.verbose:
+            print(f"在位置 {position} 显示数字 {digit} (RAM地址 {_RAM_ADDRESSES[position]}, 段码 {bin(_DIGIT_TO_SEGMENTS[digit])})")
+        # 预展开的帧位序列直接发送，免去每次的字典重建和逐位提取
+        self.send_frame(_SEGMENT_FRAME_BITS[position][digit])
     
     def display_all_digits(self):
         """
@@ -170,34 +266,16 @@ class HT1621TestController:
         在6位数码管上显示数字
         :param number: 要显示的数字 (0-999999)
         """
-        # 数字对应的段码 (共阴数码管)
-        digit_to_segments = {
-            0: 0b01111101,  # 二进制 01111101 = 十进制 125 = 十六进制 0x7D
-            1: 0b01100000,  # 二进制 01100000 = 十进制 96 = 十六进制 0x60
-            2: 0b00111110,  # 二进制 00111110 = 十进制 62 = 十六进制 0x3E
-            3: 0b01111010,  # 二进制 01111010 = 十进制 122 = 十六进制 0x7A
-            4: 0b01100011,  # 二进制 01100011 = 十进制 99 = 十六进制 0x63
-            5: 0b01011011,  # 二进制 01011011 = 十进制 91 = 十六进制 0x5B
-            6: 0b01011111,  # 二进制 01011111 = 十进制 95 = 十六进制 0x5F
-            7: 0b01110000,  # 二进制 01110000 = 十进制 112 = 十六进制 0x70
-            8: 0b01111111,  # 二进制 01111111 = 十进制 127 = 十六进制 0x7F
-            9: 0b01111011,  # 二进制 01111011 = 十进制 123 = 十六进制 0x7B
-        }
-        
         # 将数字转换为6位字符串（不足前面补0）
         num_str = f"{number:06d}"
         
-        # 显示每一位数字到对应的RAM地址
-        # RAM地址: 0,2,4,6,8,10 对应数码管的 位0,位1,位2,位3,位4,位5
-        ram_addresses = [0, 2, 4, 6, 8, 10]  # 每个RAM地址间隔2（因为每个RAM只有4个数据位，一个段码需要2个地址）
-        
-        print(f"显示数字: {number}")
         for i in range(6):
             digit = int(num_str[i])
-            segment_data = digit_to_segments[digit]
-            ram_address = ram_addresses[i]
-            print(f"位置 {i}: 数字 {digit} -> RAM地址 {ram_address} -> 段码 {bin(segment_data)}")
-            self.write_ram(ram_address, segment_data)
+            # 每位的bin()/f-string格式化和stdout写入在ARM上开销可观，仅verbose时输出
+            if self.verbose:
+                print(f"位置 {i}: 数字 {digit} -> RAM地址 {_RAM_ADDRESSES[i]} -> 段码 {bin(_DIGIT_TO_SEGMENTS[digit])}")
+            # 预展开的帧位序列直接发送，免去每次的字典重建和逐位提取
+            self.send_frame(_SEGMENT_FRAME_BITS[i][digit])
 
 
 def main():
@@ -2,18 +2,145 @@
 """
 键盘守护进程
 监听键盘输入事件并通过Unix Socket广播
-采用事件驱动机制，使用select监听输入设备数据
+采用事件驱动机制，使用selectors（epoll）监听输入设备数据
 """
 
 import json
+import sys
 import socket
-import threading
 import time
 import os
 import select
 import struct
 import configparser
-import glob
+import random
+import string
+import ctypes
+from concurrent.futures import ThreadPoolExecutor
+
+# JSON编解码：优先使用orjson（C实现且直接返回bytes，免去encode步骤），
+# 未安装时回退到标准库json，输出保持紧凑分隔符
+try:
+    import orjson
+
+    _json_loads = orjson.loads
+    _json_dumps = orjson.dumps
+except ImportError:
+    def _json_loads(data):
+        return json.loads(data)
+
+    def _json_dumps(obj):
+        return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
+# 广播可选用msgpack序列化（体积更小、编码更快），未安装时自动回退JSON
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Linux input_event结构体: struct timeval(两个long) + type + code + value
+# 共24字节；Struct对象只编译一次格式串，unpack_from免去每事件的切片拷贝
+_EVENT_STRUCT = struct.Struct('llHHi')
+_EVENT_SIZE = _EVENT_STRUCT.size
+
+# Linux键码映射表（部分常用键）
+_KEY_MAP = {
+    1: 'ESC', 2: '1', 3: '2', 4: '3', 5: '4', 6: '5', 7: '6', 8: '7', 9: '8', 10: '9', 11: '0',
+    12: '-', 13: '=', 14: 'BACKSPACE', 15: 'TAB', 16: 'q', 17: 'w', 18: 'e', 19: 'r', 20: 't',
+    21: 'y', 22: 'u', 23: 'i', 24: 'o', 25: 'p', 26: '[', 27: ']', 28: 'ENTER', 29: 'LEFT_CTRL',
+    30: 'a', 31: 's', 32: 'd', 33: 'f', 34: 'g', 35: 'h', 36: 'j', 37: 'k', 38: 'l', 39: ';',
+    40: "'", 41: '`', 42: 'LEFT_SHIFT', 43: '\\', 44: 'z', 45: 'x', 46: 'c', 47: 'v', 48: 'b',
+    49: 'n', 50: 'm', 51: ',', 52: '.', 53: '/', 54: 'RIGHT_SHIFT', 55: 'PRINT_SCREEN', 56: 'ALT',
+    57: 'SPACE', 58: 'CAPS_LOCK', 59: 'F1', 60: 'F2', 61: 'F3', 62: 'F4', 63: 'F5', 64: 'F6',
+    65: 'F7', 66: 'F8', 67: 'F9', 68: 'F10', 69: 'NUM_LOCK', 70: 'SCROLL_LOCK',
+    # 小键盘数字键 - 无论Num Lock状态都映射为数字
+    # 小键盘布局:  7(71)  8(72)  9(73)
+    #             4(75)  5(76)  6(77)
+    #             1(79)  2(80)  3(81)
+    #             0(82)
+    # Num Lock开启时发送KP7-KP9，关闭时发送HOME/UP/PAGE_UP等
+    # 我们都映射为数字，不关心Num Lock状态
+    71: 'KP7', 72: 'KP8', 73: 'KP9',   # 对应 HOME, UP, PAGE_UP
+    74: 'KPMINUS',
+    75: 'KP4', 76: 'KP5', 77: 'KP6',   # 对应 LEFT, CENTER, RIGHT
+    78: 'KPPLUS',
+    79: 'KP1', 80: 'KP2', 81: 'KP3',   # 对应 END, DOWN, PAGE_DOWN
+    82: 'KP0',                         # 对应 INSERT
+    83: 'KPDOT',                       # 对应 DELETE
+    86: '|', 87: 'F11', 88: 'F12',
+    # 小键盘回车 (KEY_KPENTER -> 键码 96)
+    96: 'KPENTER',
+    # 小键盘斜杠 (KEY_KPSLASH -> 键码 98)
+    98: 'KPSLASH',
+    # 小键盘星号 (KEY_KPASTERISK -> 键码 55，与小键盘乘号共用)
+    # 注意：55 已被 PRINT_SCREEN 占用，这里不重复映射
+}
+
+# key_event消息的预编译模板（与GPIO守护进程的广播信封同一套路）：
+# 固定骨架只在导入时写一次，热路径仅填充变量字段，免去每事件的
+# 字典构建和完整json.dumps；键名经json.dumps预转义（如'\\'键）
+_KEY_EVENT_TEMPLATE = ('{"type":"key_event","id":%d,"timestamp":%.6f,'
+                       '"event_type":"%s","key":%s,"key_code":%d,"device":"%s"}')
+_KEY_EVENT_TEMPLATE_SIM = ('{"type":"key_event","id":%d,"timestamp":%.6f,'
+                           '"event_type":"%s","key":%s}')
+
+# 按键码下标的256项查找表，未映射的键码直接预生成KEY_<code>回退名，
+# 查键名时只剩一次C层数组下标访问，字符串也因此天然被复用
+_KEY_NAMES = tuple(_KEY_MAP.get(code, f'KEY_{code}') for code in range(256))
+
+
+# sendmmsg(2)/recvmmsg(2)：一次系统调用发出或收取多个数据报，
+# 广播和查询风暴的系统调用次数都从 报文数 降为 1。
+# libc不可用时保持None，相应路径自动回退到逐报文sendto/recvfrom
+try:
+    _libc = ctypes.CDLL('libc.so.6', use_errno=True)
+    _sendmmsg = _libc.sendmmsg
+    _recvmmsg = _libc.recvmmsg
+except (OSError, AttributeError):
+    _sendmmsg = None
+    _recvmmsg = None
+
+_MSG_DONTWAIT = 0x40
+
+
+class _Iovec(ctypes.Structure):
+    _fields_ = [('iov_base', ctypes.c_void_p),
+                ('iov_len', ctypes.c_size_t)]
+
+
+class _SockaddrUn(ctypes.Structure):
+    _fields_ = [('sun_family', ctypes.c_ushort),
+                ('sun_path', ctypes.c_char * 108)]
+
+
+class _Msghdr(ctypes.Structure):
+    _fields_ = [('msg_name', ctypes.c_void_p),
+                ('msg_namelen', ctypes.c_uint32),
+                ('msg_iov', ctypes.POINTER(_Iovec)),
+                ('msg_iovlen', ctypes.c_size_t),
+                ('msg_control', ctypes.c_void_p),
+                ('msg_controllen', ctypes.c_size_t),
+                ('msg_flags', ctypes.c_int)]
+
+
+class _Mmsghdr(ctypes.Structure):
+    _fields_ = [('msg_hdr', _Msghdr),
+                ('msg_len', ctypes.c_uint)]
+
+
+def _read_device_name(event_path):
+    """读取单个输入设备的sysfs名称，失败或不存在时返回None"""
+    device_name_path = event_path.replace('/dev/input/', '/sys/class/input/') + '/device/name'
+    try:
+        # 裸fd一次read取回名称，省掉TextIOWrapper整套缓冲和解码层
+        fd = os.open(device_name_path, os.O_RDONLY)
+        try:
+            raw = os.read(fd, 256)
+        finally:
+            os.close(fd)
+        return raw.decode('utf-8', 'ignore').strip().lower()
+    except OSError:
+        return None
 
 
 def find_keyboard_devices():
@@ -23,23 +150,34 @@ def find_keyboard_devices():
     """
     keyboard_devices = []
     
-    # 遍历所有输入事件设备
-    for event_path in glob.glob('/dev/input/event*'):
-        try:
-            # 读取设备信息来判断是否为键盘
-            device_name_path = event_path.replace('/dev/input/', '/sys/class/input/') + '/device/name'
-            if os.path.exists(device_name_path):
-                with open(device_name_path, 'r') as f:
-                    device_name = f.read().strip().lower()
-                    
-                # 检查设备名称是否包含键盘相关关键词
-                if any(keyword in device_name for keyword in ['keyboard', 'key', 'atkbd', 'usb keyboard', 'usbkeyboard']):
-                    keyboard_devices.append(event_path)
-                    print(f"发现键盘设备: {event_path} ({device_name})")
-        
-        except Exception:
-            # 如果无法读取设备信息，跳过该设备
+    # os.scandir一次系统调用列出目录，免去glob的模式编译和逐项stat
+    event_paths = []
+    try:
+        with os.scandir('/dev/input') as entries:
+            for entry in entries:
+                if entry.name.startswith('event'):
+                    event_paths.append(entry.path)
+    except OSError:
+        pass
+    event_paths.sort()
+    
+    # sysfs读取是纯I/O等待，用线程池并发探测所有设备，
+    # 启动耗时从 设备数×单次延迟 降为约一次延迟
+    if event_paths:
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            device_names = list(pool.map(_read_device_name, event_paths))
+    else:
+        device_names = []
+    
+    for event_path, device_name in zip(event_paths, device_names):
+        if device_name is None:
+            # 无法读取设备信息，跳过该设备
             continue
+        # 检查设备名称是否包含键盘相关关键词
+        # （原关键词列表中其余项都含有"key"子串，等价于下面两个判断）
+        if 'key' in device_name or 'atkbd' in device_name:
+            keyboard_devices.append(event_path)
+            print(f"发现键盘设备: {event_path} ({device_name})")
     
     if not keyboard_devices:
         print("警告: 未找到键盘设备，将尝试使用默认设备 /dev/input/event0")
@@ -52,18 +190,20 @@ class KeyboardEventDaemon:
     """键盘事件守护进程"""
     
     def __init__(self, config_path, simulate=False, debug=False):
-        self.config = configparser.ConfigParser()
+        # RawConfigParser跳过%插值处理，本配置不用插值语法
+        self.config = configparser.RawConfigParser()
         self.config.read(config_path)
         
         # 是否使用模拟模式和调试模式
         self.simulate = simulate
         self.debug = debug
         
-        # 存储当前按键状态（跟踪所有按键的按下/释放状态）
-        self.current_keys = {}  # {key_name: state}，state为True表示按下，False表示释放
-        
-        # 存储当前按键状态时间戳
-        self.current_keys_timestamp = {}
+        # 当前按键状态按键码下标存储（SoA布局）：按下/释放只是一次
+        # 数组写入，不再对两个字符串键字典做哈希查找和删除
+        self._key_state = bytearray(256)   # 0=释放，1=按下
+        self._key_ts = [0.0] * 256         # 按下时刻的时间戳
+        # 键码到键名的实例表：模拟模式按ord(字符)登记字符本身作为键名
+        self._key_name_by_code = list(_KEY_NAMES)
         
         # 自动查找键盘设备
         self.keyboard_devices = find_keyboard_devices()
@@ -72,30 +212,65 @@ class KeyboardEventDaemon:
         self.device_fds = []
         
         # 创建控制Socket（UDP）
-        socket_path = self.config.get('daemon_config', 'socket_path', fallback='/tmp/keyboard.sock')
-        if os.path.exists(socket_path):
-            os.unlink(socket_path)
+        # 解析后的socket路径直接存下来，stop()复用，不再二次查询配置
+        self.socket_path = self.config.get('daemon_config', 'socket_path', fallback='/tmp/keyboard.sock')
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
         
         self.control_socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
-        self.control_socket.bind(socket_path)
-        os.chmod(socket_path, 0o777)
+        self.control_socket.bind(self.socket_path)
+        os.chmod(self.socket_path, 0o777)
         
         # 创建状态监听Socket（UDP）
-        get_status_path = self.config.get('daemon_config', 'get_statu_path', fallback='/tmp/keyboard_get.sock')
-        if os.path.exists(get_status_path):
-            os.unlink(get_status_path)
+        self.get_status_path = self.config.get('daemon_config', 'get_statu_path', fallback='/tmp/keyboard_get.sock')
+        if os.path.exists(self.get_status_path):
+            os.unlink(self.get_status_path)
         
         self.status_socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
-        self.status_socket.bind(get_status_path)
-        os.chmod(get_status_path, 0o777)
-        
-        # 存储客户端地址（用于回复查询）
+        self.status_socket.bind(self.get_status_path)
+        os.chmod(self.get_status_path, 0o777)
+        
+        # 广播序列化格式：json（默认，兼容现有客户端）或msgpack
+        # 与GPIO守护进程的status_serializer配置同一套路
+        self.status_serializer = self.config.get('daemon_config', 'status_serializer', fallback='json')
+        if self.status_serializer == 'msgpack' and msgpack is None:
+            print("警告: 未安装msgpack包，状态广播回退为json格式")
+            self.status_serializer = 'json'
+        
+        # 上一次广播时的按键状态快照，用于抑制状态未变化的重复广播
+        self._last_broadcast_state = bytes(256)
+        
+        # recvmmsg用的预分配接收结构：16个报文缓冲与对端地址槽，
+        # 每次批量收取直接复用，不在热路径上反复分配
+        self._rx_slots = 16
+        self._rx_bufsize = 1024
+        if _recvmmsg is not None:
+            n = self._rx_slots
+            self._rx_bufs = [ctypes.create_string_buffer(self._rx_bufsize) for _ in range(n)]
+            self._rx_iovs = (_Iovec * n)()
+            self._rx_names = (_SockaddrUn * n)()
+            self._rx_msgs = (_Mmsghdr * n)()
+            for i in range(n):
+                self._rx_iovs[i].iov_base = ctypes.cast(self._rx_bufs[i], ctypes.c_void_p)
+                self._rx_iovs[i].iov_len = self._rx_bufsize
+                hdr = self._rx_msgs[i].msg_hdr
+                hdr.msg_name = ctypes.cast(ctypes.byref(self._rx_names[i]), ctypes.c_void_p)
+                hdr.msg_iov = ctypes.pointer(self._rx_iovs[i])
+                hdr.msg_iovlen = 1
+        
+        # 状态订阅客户端的地址集合。所有发送都走已绑定的
+        # status_socket，客户端recvfrom拿到的源地址才是守护进程的
+        # 监听路径，ACK能原路回来；每客户端单独connect的socket没有
+        # 绑定地址，会让客户端收到addr=None而无从回复
+        # 守护进程只有一个事件循环线程，客户端表和消息ID
+        # 都只被它读写，不需要加锁
         self.client_addresses = set()
-        self.client_addresses_lock = threading.Lock()
+        # 客户端地址 -> 打包好的(sockaddr_un, namelen)，sendmmsg批量
+        # 广播直接引用缓存结构，不再每次广播重新编码地址
+        self._sockaddr_cache = {}
         
         # 消息ID计数器
         self.message_id_counter = 0
-        self.message_id_lock = threading.Lock()
         
         # 运行标志
         self.running = False
@@ -105,14 +280,13 @@ class KeyboardEventDaemon:
     
     def get_next_message_id(self):
         """获取下一个消息ID"""
-        with self.message_id_lock:
-            self.message_id_counter += 1
-            return self.message_id_counter
+        self.message_id_counter += 1
+        return self.message_id_counter
     
     def handle_control_command(self, data, addr):
         """处理控制命令"""
         try:
-            command = json.loads(data.decode('utf-8'))
+            command = _json_loads(data)
             
             # 调试：打印传入的命令
             if self.debug:
@@ -128,38 +302,176 @@ class KeyboardEventDaemon:
     
     def broadcast_key_event(self, event_data):
         """向所有已知的客户端广播键盘事件"""
+        # 没有订阅客户端时直接返回（开机后常见情况），
+        # 按键事件不花任何组装、拷贝和序列化成本
+        if not self.client_addresses:
+            return
+        
+        # 状态快照与上次广播完全一致时跳过（例如模拟模式释放一个
+        # 本就未按下的键）：输出不变就不做序列化和sendto系统调用
+        # bytes(bytearray)是一次256字节memcpy，比较是memcmp，开销可忽略
+        state_snapshot = bytes(self._key_state)
+        if state_snapshot == self._last_broadcast_state:
+            return
+        self._last_broadcast_state = state_snapshot
+        
         # 添加消息ID和时间戳
         message_id = self.get_next_message_id()
         
-        # 创建包含当前所有按键状态的消息
+        # 只携带本次事件增量的消息：全量按键状态不再随每个事件广播，
+        # 客户端启动时query_status拿全量，之后按press/release增量维护
+        timestamp = time.time()
+        
+        # 调试：打印广播的消息
+        if self.debug:
+            print(f"调试: 广播键盘事件 - id={message_id} {event_data}")
+        
+        # 只序列化一次，所有客户端复用同一份编码结果
+        if self.status_serializer == 'msgpack':
+            message_data = {
+                "type": "key_event",
+                "id": message_id,
+                "timestamp": timestamp,
+                **{k: v for k, v in event_data.items() if k not in ['type', 'id', 'timestamp']}
+            }
+            payload = msgpack.packb(message_data, use_bin_type=True)
+        else:
+            # 固定骨架走预编译模板，只格式化变量字段
+            key_json = json.dumps(event_data['key'], ensure_ascii=False)
+            if 'key_code' in event_data:
+                payload = (_KEY_EVENT_TEMPLATE % (
+                    message_id, timestamp, event_data['event_type'], key_json,
+                    event_data['key_code'], event_data['device'])).encode('utf-8')
+            else:
+                payload = (_KEY_EVENT_TEMPLATE_SIM % (
+                    message_id, timestamp, event_data['event_type'], key_json)).encode('utf-8')
+        
+        self._broadcast_payload(payload)
+    
+    def broadcast_key_events(self, events):
+        """把同一读取批次里的多个按键事件合并成单条消息广播
+        批次整体只做一次序列化和一轮发送，成本不随事件数增长"""
+        if not self.client_addresses or not events:
+            return
+        
+        # 批次内的增量必须完整送达（例如同批的按下+释放），
+        # 只更新去重基准，不做抑制判断
+        self._last_broadcast_state = bytes(self._key_state)
+        
         message_data = {
-            "type": "key_event",
-            "id": message_id,
+            "type": "key_events",
+            "id": self.get_next_message_id(),
             "timestamp": time.time(),
-            "current_keys": dict(self.current_keys),  # 包含所有当前按键状态
-            **{k: v for k, v in event_data.items() if k not in ['type', 'id', 'timestamp']}
+            "events": events
         }
         
-        # 调试：打印广播的消息
         if self.debug:
-            print(f"调试: 广播键盘事件 - {message_data}")
+            print(f"调试: 广播键盘事件批次 - {len(events)} 个事件")
         
-        with self.client_addresses_lock:
+        if self.status_serializer == 'msgpack':
+            payload = msgpack.packb(message_data, use_bin_type=True)
+        else:
+            payload = _json_dumps(message_data)
+        self._broadcast_payload(payload)
+    
+    def _broadcast_payload(self, payload):
+        """把编码好的消息发给全部订阅客户端并剔除失联者"""
+        clients = tuple(self.client_addresses)
+        
+        # 多客户端时用sendmmsg一次性发出，单客户端或libc不可用时
+        # 逐个sendto；两条路径都从已绑定的status_socket发出，
+        # 客户端看到的源地址一致且可用于回ACK
+        if _sendmmsg is not None and len(clients) > 1:
+            disconnected_clients = self._sendmmsg_broadcast(payload, clients)
+        else:
             disconnected_clients = []
-            for addr in self.client_addresses:
-                if addr is None:  # 跳过None地址
-                    disconnected_clients.append(addr)
-                    continue
+            for addr in clients:
                 try:
-                    self.status_socket.sendto(json.dumps(message_data).encode('utf-8'), addr)
+                    self.status_socket.sendto(payload, addr)
                 except Exception as e:
                     print(f"向客户端 {addr} 发送键盘事件失败: {e}")
                     disconnected_clients.append(addr)
-            
-            # 移除断开的客户端
-            for addr in disconnected_clients:
-                if addr in self.client_addresses:
-                    self.client_addresses.remove(addr)
+        
+        # 移除断开的客户端
+        for addr in disconnected_clients:
+            self._drop_client(addr)
+    
+    def _drain_datagrams(self, sock):
+        """收取socket上当前累积的全部数据报 -> [(data, addr), ...]
+        可用时走recvmmsg一次取一批，否则退化为单次recvfrom"""
+        if _recvmmsg is None:
+            return [sock.recvfrom(self._rx_bufsize)]
+        
+        results = []
+        fd = sock.fileno()
+        n = self._rx_slots
+        while True:
+            # namelen被内核改写为实际长度，每轮复位
+            for i in range(n):
+                self._rx_msgs[i].msg_hdr.msg_namelen = ctypes.sizeof(_SockaddrUn)
+            got = _recvmmsg(fd, self._rx_msgs, n, _MSG_DONTWAIT, None)
+            if got <= 0:
+                break
+            for i in range(got):
+                data = self._rx_bufs[i].raw[:self._rx_msgs[i].msg_len]
+                namelen = self._rx_msgs[i].msg_hdr.msg_namelen
+                if namelen > 2:
+                    addr = self._rx_names[i].sun_path[:namelen - 2].rstrip(b'\x00').decode('utf-8', 'ignore')
+                else:
+                    # 对端未绑定地址，无法回复
+                    addr = None
+                results.append((data, addr))
+            if got < n:
+                break
+        return results
+    
+    def _register_client(self, addr):
+        """登记一个状态订阅客户端"""
+        if addr is None:
+            return
+        self.client_addresses.add(addr)
+    
+    def _drop_client(self, addr):
+        """移除客户端及其缓存的sockaddr"""
+        self._sockaddr_cache.pop(addr, None)
+        self.client_addresses.discard(addr)
+    
+    def _sendmmsg_broadcast(self, payload, addrs):
+        """通过sendmmsg(2)把同一数据报批量发给所有客户端地址
+        返回发送失败（视为已断开）的地址列表"""
+        n = len(addrs)
+        buf = ctypes.create_string_buffer(payload, len(payload))
+        iov = _Iovec(ctypes.cast(buf, ctypes.c_void_p), len(payload))
+        msgs = (_Mmsghdr * n)()
+        cache = self._sockaddr_cache
+        for i, addr in enumerate(addrs):
+            entry = cache.get(addr)
+            if entry is None:
+                path = addr.encode('utf-8') if isinstance(addr, str) else bytes(addr)
+                sa = _SockaddrUn(socket.AF_UNIX, path[:107])
+                entry = cache[addr] = (sa, 2 + len(path) + 1)
+            sa, namelen = entry
+            hdr = msgs[i].msg_hdr
+            hdr.msg_name = ctypes.cast(ctypes.byref(sa), ctypes.c_void_p)
+            hdr.msg_namelen = namelen
+            hdr.msg_iov = ctypes.pointer(iov)
+            hdr.msg_iovlen = 1
+        
+        fd = self.status_socket.fileno()
+        mmsghdr_size = ctypes.sizeof(_Mmsghdr)
+        disconnected = []
+        start = 0
+        while start < n:
+            sent = _sendmmsg(fd, ctypes.byref(msgs, start * mmsghdr_size), n - start, 0)
+            if sent > 0:
+                start += sent
+            else:
+                # 出错时失败的是当前批次第一个目标，剔除后继续发余下的
+                addr = addrs[start]
+                print(f"向客户端 {addr} 发送键盘事件失败: errno={ctypes.get_errno()}")
+                disconnected.append(addr)
+                start += 1
+        return disconnected
     
     def send_current_status(self, client_addr):
         """向指定客户端发送当前键盘状态"""
@@ -168,17 +480,26 @@ class KeyboardEventDaemon:
             print("错误: 客户端地址为None，无法发送状态")
             return
             
+        state = self._key_state
+        names = self._key_name_by_code
+        ts = self._key_ts
         current_status = {
             "type": "current_status",
             "id": self.get_next_message_id(),
             "timestamp": time.time(),
-            "current_keys": dict(self.current_keys),
-            "current_keys_timestamp": dict(self.current_keys_timestamp)
+            "current_keys": self.get_pressed_keys(),
+            "current_keys_timestamp": {names[i]: ts[i] for i in range(256) if state[i]}
         }
         
+        if self.status_serializer == 'msgpack':
+            payload = msgpack.packb(current_status, use_bin_type=True)
+        else:
+            payload = _json_dumps(current_status)
+        
         try:
-            self.status_socket.sendto(json.dumps(current_status).encode('utf-8'), client_addr)
-            print(f"已向客户端 {client_addr} 发送当前键盘状态")
+            self.status_socket.sendto(payload, client_addr)
+            if self.debug:
+                print(f"已向客户端 {client_addr} 发送当前键盘状态")
         except Exception as e:
             print(f"向客户端 {client_addr} 发送状态失败: {e}")
     
@@ -192,12 +513,9 @@ class KeyboardEventDaemon:
         
         for device_path in self.keyboard_devices:
             try:
-                fd = open(device_path, 'rb')
-                
-                # 设置为非阻塞模式
-                import fcntl
-                fl = fcntl.fcntl(fd, fcntl.F_GETFL)
-                fcntl.fcntl(fd, fcntl.F_SETFL, fl | os.O_NONBLOCK)
+                # 直接用os.open拿裸fd并在打开时就带上O_NONBLOCK，
+                # 跳过BufferedReader缓冲层和单独的fcntl调用
+                fd = os.open(device_path, os.O_RDONLY | os.O_NONBLOCK)
                 
                 self.device_fds.append((fd, device_path))
                 print(f"已打开键盘设备: {device_path}")
@@ -214,171 +532,129 @@ class KeyboardEventDaemon:
         """关闭所有键盘设备文件"""
         for fd, device_path in self.device_fds:
             try:
-                fd.close()
+                os.close(fd)
             except Exception as e:
                 print(f"关闭设备 {device_path} 失败: {e}")
         self.device_fds = []
     
-    def keyboard_monitoring(self):
-        """键盘监控线程 - 使用select监听输入设备"""
-        import random
-        import string
-        
-        if self.simulate:
-            # 模拟键盘事件
-            while self.running:
-                # 模拟键盘输入事件
-                if random.random() < 0.3:  # 30% 概率触发事件
-                    key_char = random.choice(string.ascii_letters + string.digits)
-                    event_type = random.choice(['press', 'release'])
-                    
-                    # 更新当前按键状态
-                    if event_type == 'press':
-                        self.current_keys[key_char] = True
-                        self.current_keys_timestamp[key_char] = time.time()
-                    else:
-                        self.current_keys[key_char] = False
-                        if key_char in self.current_keys_timestamp:
-                            del self.current_keys_timestamp[key_char]
-                    
-                    # 创建键盘事件数据
-                    event_data = {
-                        "event_type": event_type,
-                        "key": key_char,
-                        "timestamp": time.time()
-                    }
-                    
-                    print(f"模拟键盘事件: {event_data}")
-                    self.broadcast_key_event(event_data)
-                
-                time.sleep(1)
+    def _emit_simulated_event(self):
+        """产生一个模拟键盘事件并广播（仅模拟模式）"""
+        key_char = random.choice(string.ascii_letters + string.digits)
+        event_type = random.choice(['press', 'release'])
+        
+        # 更新当前按键状态（模拟模式直接用字符的ord作为键码）
+        code = ord(key_char)
+        self._key_name_by_code[code] = key_char
+        if event_type == 'press':
+            self._key_state[code] = 1
+            self._key_ts[code] = time.time()
         else:
-            # 使用select监听实际键盘设备
-            while self.running:
+            self._key_state[code] = 0
+            # 释放时写0.0哨兵值清掉时间戳，槽位不会残留过期数据
+            self._key_ts[code] = 0.0
+        
+        # 创建键盘事件数据
+        event_data = {
+            "event_type": event_type,
+            "key": key_char,
+            "timestamp": time.time()
+        }
+        
+        # 每事件的f-string格式化和stdout写入只在调试时进行
+        if self.debug:
+            print(f"模拟键盘事件: {event_data}")
+        self.broadcast_key_event(event_data)
+    
+    def _read_device_events(self, ready_fd, device_path):
+        """清空一个就绪设备fd上的全部事件并广播按键变化"""
+        burst_events = []
+        try:
+            # 持续读取直到没有更多数据
+            while True:
                 try:
-                    # 获取所有设备文件描述符
-                    fds = [fd for fd, _ in self.device_fds]
-                    
-                    if not fds:
-                        # 没有设备可监听，等待并重试
-                        time.sleep(1)
-                        continue
-                    
-                    # 使用select监听设备输入，超时时间0.1秒
-                    ready_fds, _, _ = select.select(fds, [], [], 0.1)
-                    
-                    for ready_fd, device_path in self.device_fds:
-                        if ready_fd in ready_fds:
-                            # 一次性读取所有可用的数据
-                            try:
-                                # 持续读取直到没有更多数据
-                                while True:
-                                    try:
-                                        # 读取输入事件 (Linux input event结构体: 24字节)
-                                        data = ready_fd.read(24)
-                                        if not data or len(data) < 24:
-                                            break
-                                        
-                                        # 解析input_event结构体
-                                        # struct input_event {
-                                        #     struct timeval time;  // 16 bytes total (64位系统上是两个long)
-                                        #     unsigned short type;  // 2 bytes
-                                        #     unsigned short code;  // 2 bytes
-                                        #     unsigned int value;   // 4 bytes
-                                        # };
-                                        # 总共24字节: 8 + 8 + 2 + 2 + 4 = 24
-                                        tv_sec, tv_usec, event_type, code, value = struct.unpack('llHHi', data)
-                                        
-                                        # 检查是否是键盘事件
-                                        if event_type == 1:  # EV_KEY
-                                            # 尝试将键码转换为可读的键名
-                                            key_name = self.get_key_name(code)
-                                            
-                                            # 确定事件类型
-                                            if value == 1:
-                                                event_type_str = "press"
-                                                # 更新当前按键状态
-                                                self.current_keys[key_name] = True
-                                                self.current_keys_timestamp[key_name] = time.time()
-                                            elif value == 0:
-                                                event_type_str = "release"
-                                                # 更新当前按键状态
-                                                self.current_keys[key_name] = False
-                                                if key_name in self.current_keys_timestamp:
-                                                    del self.current_keys_timestamp[key_name]
-                                            else:
-                                                event_type_str = "repeat"
-                                            
-                                            # 创建键盘事件数据
-                                            event_data = {
-                                                "event_type": event_type_str,
-                                                "key": key_name,
-                                                "key_code": code,
-                                                "device": device_path,
-                                                "timestamp": time.time()
-                                            }
-                                            
-                                            # 只广播按键按下和释放事件，忽略重复事件
-                                            if event_type_str in ['press', 'release']:
-                                                self.broadcast_key_event(event_data)
-                                                if self.debug:
-                                                    print(f"键盘事件: {event_data}")
-                                                
-                                    except BlockingIOError:
-                                        # 没有更多数据可读，跳出内部循环
-                                        break
-                                    except Exception as e:
-                                        # 其他错误，可能设备已断开
-                                        print(f"读取设备 {device_path} 时出错: {e}")
-                                        break
-                                        
-                            except Exception as e:
-                                # 设备可能已断开，尝试重新打开
-                                print(f"读取设备 {device_path} 时出错: {e}")
-                                self.close_keyboard_devices()
-                                time.sleep(1)
-                                self.open_keyboard_devices()
-                                
+                    # 批量读取：evdev的read只会返回整数个事件，
+                    # 一次取回最多64个，代替每事件一次read(24)系统调用
+                    data = os.read(ready_fd, _EVENT_SIZE * 64)
+                    if not data:
+                        break
+                except BlockingIOError:
+                    # 没有更多数据可读，跳出内部循环
+                    break
                 except Exception as e:
-                    print(f"键盘监控线程发生错误: {e}")
-                    time.sleep(1)
+                    # 其他错误，可能设备已断开
+                    print(f"读取设备 {device_path} 时出错: {e}")
+                    break
+                
+                # evdev保证read只返回整数个事件；iter_unpack在C层
+                # 迭代整块缓冲，免去Python层的偏移计算和逐次调用
+                leftover = len(data) % _EVENT_SIZE
+                if leftover:
+                    data = data[:len(data) - leftover]
+                for tv_sec, tv_usec, event_type, code, value in _EVENT_STRUCT.iter_unpack(data):
+                    # 检查是否是键盘事件
+                    if event_type == 1:  # EV_KEY
+                        # 自动重复事件(value==2)不改变状态也不广播：
+                        # 按住一个键内核每秒生成约30个，先于查键名和
+                        # 组装消息直接丢弃，省掉这条路径上的全部工作
+                        if value == 1:
+                            event_type_str = "press"
+                            # 更新当前按键状态
+                            state_index = code & 0xFF
+                            self._key_state[state_index] = 1
+                            self._key_ts[state_index] = time.time()
+                        elif value == 0:
+                            event_type_str = "release"
+                            # 更新当前按键状态，时间戳写0.0哨兵值而非残留旧值
+                            state_index = code & 0xFF
+                            self._key_state[state_index] = 0
+                            self._key_ts[state_index] = 0.0
+                        else:
+                            continue
+                        
+                        # 创建键盘事件数据
+                        event_data = {
+                            "event_type": event_type_str,
+                            "key": self.get_key_name(code),
+                            "key_code": code,
+                            "device": device_path,
+                            "timestamp": time.time()
+                        }
+                        
+                        # 先收集，清空本轮数据后统一广播
+                        burst_events.append(event_data)
+                        if self.debug:
+                            print(f"键盘事件: {event_data}")
+        
+        except Exception as e:
+            # 设备可能已断开，尝试重新打开
+            print(f"读取设备 {device_path} 时出错: {e}")
+            self.close_keyboard_devices()
+            time.sleep(1)
+            self.open_keyboard_devices()
+        
+        # 单个事件沿用key_event消息，成串的（如连招、快速滚键）
+        # 合并为一条key_events，序列化和发送成本按批摊薄
+        if len(burst_events) == 1:
+            self.broadcast_key_event(burst_events[0])
+        elif burst_events:
+            self.broadcast_key_events(burst_events)
+    
+    def get_pressed_keys(self, state=None):
+        """快照当前按下的按键 -> {键名: True}
+        只遍历状态数组中置1的下标，成本与按下键数成正比，
+        不随历史上出现过的按键数量增长
+        :param state: 可选的已抓取状态快照，保证与去重比较用的是同一份视图"""
+        if state is None:
+            state = self._key_state
+        names = self._key_name_by_code
+        return {names[i]: True for i in range(256) if state[i]}
     
     def get_key_name(self, key_code):
         """将键码转换为可读的键名"""
-        # Linux键码映射表（部分常用键）
-        key_map = {
-            1: 'ESC', 2: '1', 3: '2', 4: '3', 5: '4', 6: '5', 7: '6', 8: '7', 9: '8', 10: '9', 11: '0',
-            12: '-', 13: '=', 14: 'BACKSPACE', 15: 'TAB', 16: 'q', 17: 'w', 18: 'e', 19: 'r', 20: 't',
-            21: 'y', 22: 'u', 23: 'i', 24: 'o', 25: 'p', 26: '[', 27: ']', 28: 'ENTER', 29: 'LEFT_CTRL',
-            30: 'a', 31: 's', 32: 'd', 33: 'f', 34: 'g', 35: 'h', 36: 'j', 37: 'k', 38: 'l', 39: ';',
-            40: "'", 41: '`', 42: 'LEFT_SHIFT', 43: '\\', 44: 'z', 45: 'x', 46: 'c', 47: 'v', 48: 'b',
-            49: 'n', 50: 'm', 51: ',', 52: '.', 53: '/', 54: 'RIGHT_SHIFT', 55: 'PRINT_SCREEN', 56: 'ALT',
-            57: 'SPACE', 58: 'CAPS_LOCK', 59: 'F1', 60: 'F2', 61: 'F3', 62: 'F4', 63: 'F5', 64: 'F6',
-            65: 'F7', 66: 'F8', 67: 'F9', 68: 'F10', 69: 'NUM_LOCK', 70: 'SCROLL_LOCK',
-            # 小键盘数字键 - 无论Num Lock状态都映射为数字
-            # 小键盘布局:  7(71)  8(72)  9(73)
-            #             4(75)  5(76)  6(77)
-            #             1(79)  2(80)  3(81)
-            #             0(82)
-            # Num Lock开启时发送KP7-KP9，关闭时发送HOME/UP/PAGE_UP等
-            # 我们都映射为数字，不关心Num Lock状态
-            71: 'KP7', 72: 'KP8', 73: 'KP9',   # 对应 HOME, UP, PAGE_UP
-            74: 'KPMINUS',
-            75: 'KP4', 76: 'KP5', 77: 'KP6',   # 对应 LEFT, CENTER, RIGHT
-            78: 'KPPLUS',
-            79: 'KP1', 80: 'KP2', 81: 'KP3',   # 对应 END, DOWN, PAGE_DOWN
-            82: 'KP0',                         # 对应 INSERT
-            83: 'KPDOT',                       # 对应 DELETE
-            86: '|', 87: 'F11', 88: 'F12',
-            # 小键盘回车 (KEY_KPENTER -> 键码 96)
-            96: 'KPENTER',
-            # 小键盘斜杠 (KEY_KPSLASH -> 键码 98)
-            98: 'KPSLASH',
-            # 小键盘星号 (KEY_KPASTERISK -> 键码 55，与小键盘乘号共用)
-            # 注意：55 已被 PRINT_SCREEN 占用，这里不重复映射
-        }
-        
-        return key_map.get(key_code, f'KEY_{key_code}')
+        # 元组下标是C层数组访问，比字典哈希查找更快且无每次调用的分配
+        if 0 <= key_code < 256:
+            return _KEY_NAMES[key_code]
+        return f'KEY_{key_code}'
     
     def run(self):
         """运行守护进程"""
@@ -391,47 +667,74 @@ class KeyboardEventDaemon:
             self.stop()
             return
         
-        # 启动键盘监控线程
-        keyboard_thread = threading.Thread(target=self.keyboard_monitoring, daemon=True)
-        keyboard_thread.start()
+        # 单一epoll事件循环：控制socket、状态socket和键盘设备fd
+        # 都注册在同一个epoll里。守护进程只剩这一个线程，按键路径上
+        # 不再有监控线程与主循环之间的GIL争抢和锁开销
+        epoll = select.epoll()
+        ctrl_fd = self.control_socket.fileno()
+        status_fd = self.status_socket.fileno()
+        epoll.register(ctrl_fd, select.EPOLLIN)
+        epoll.register(status_fd, select.EPOLLIN)
+        registered = {}  # 设备fd -> 设备路径
+        
+        # 模拟模式按泊松过程排期下一个事件，epoll超时顺便充当定时器
+        next_sim = time.monotonic() + random.expovariate(0.3) if self.simulate else None
         
-        # 主循环 - 处理控制命令和状态查询
         while self.running:
             try:
-                # 使用select来实现非阻塞的socket监听
-                # 同时监听控制socket和状态socket
-                ready_sockets, _, _ = select.select(
-                    [self.control_socket, self.status_socket],
-                    [],
-                    [],
-                    1.0
-                )
+                if not self.simulate:
+                    # 初次进入或设备重连后fd列表变化时重新注册
+                    # （ET模式配合_read_device_events的批量读清空循环）
+                    current = dict(self.device_fds)
+                    if registered != current:
+                        for fd in registered:
+                            try:
+                                epoll.unregister(fd)
+                            except OSError:
+                                pass
+                        for fd in current:
+                            epoll.register(fd, select.EPOLLIN | select.EPOLLET)
+                        registered = current
+                
+                # 超时用于周期性检查running标志，模拟模式下兼作事件定时
+                timeout = 1.0
+                if next_sim is not None:
+                    timeout = min(1.0, max(0.0, next_sim - time.monotonic()))
                 
-                for sock in ready_sockets:
-                    if sock == self.control_socket:
-                        # 处理控制命令
-                        data, addr = sock.recvfrom(1024)
-                        if data:
-                            # 使用线程处理命令，避免阻塞主循环
-                            command_thread = threading.Thread(
-                                target=self.handle_control_command,
-                                args=(data, addr),
-                                daemon=True
-                            )
-                            command_thread.start()
+                for fd, _events in epoll.poll(timeout):
+                    if fd == ctrl_fd:
+                        # 处理控制命令（成批收取，查询风暴不必每报文绕一圈epoll）
+                        for data, addr in self._drain_datagrams(self.control_socket):
+                            if data:
+                                # 命令处理只是json.loads加几个判断，直接内联执行，
+                                # 不再为每个数据报创建一次性线程
+                                self.handle_control_command(data, addr)
                     
-                    elif sock == self.status_socket:
-                        # 处理状态查询
-                        data, addr = sock.recvfrom(1024)
-                        if data:
+                    elif fd == status_fd:
+                        # 处理状态查询（同样成批收取）
+                        for data, addr in self._drain_datagrams(self.status_socket):
+                            if not data:
+                                continue
+                            
+                            # ACK占入站消息的绝大多数且前缀固定（紧凑格式与
+                            # json.dumps默认带空格格式各一种），命中前缀就
+                            # 直接登记客户端，只有调试要打印id时才完整解析
+                            if data.startswith(b'{"type":"ack"') or data.startswith(b'{"type": "ack"'):
+                                self._register_client(addr)
+                                if self.debug:
+                                    try:
+                                        print(f"收到客户端ACK: {_json_loads(data).get('id')}")
+                                    except (json.JSONDecodeError, ValueError):
+                                        pass
+                                continue
+                            
                             try:
-                                client_msg = json.loads(data.decode('utf-8'))
+                                client_msg = _json_loads(data)
                                 
                                 # 记录客户端地址以便后续广播
-                                with self.client_addresses_lock:
-                                    self.client_addresses.add(addr)
+                                self._register_client(addr)
                                 
-                                # 处理ACK消息
+                                # 处理ACK消息（非常规格式化的ACK走慢路径到这里）
                                 if client_msg.get('type') == 'ack':
                                     ack_id = client_msg.get('id')
                                     if self.debug:
@@ -441,9 +744,20 @@ class KeyboardEventDaemon:
                                 elif client_msg.get('type') == 'query_status':
                                     self.send_current_status(addr)
                                     
-                            except json.JSONDecodeError:
+                            except (json.JSONDecodeError, ValueError):
                                 # 不是JSON格式的消息，忽略
                                 pass
+                    
+                    else:
+                        # 设备重开后可能残留已注销fd的事件，查不到就忽略
+                        device_path = registered.get(fd)
+                        if device_path is not None:
+                            self._read_device_events(fd, device_path)
+                
+                # 到期则触发模拟事件并排期下一个
+                if next_sim is not None and time.monotonic() >= next_sim:
+                    self._emit_simulated_event()
+                    next_sim = time.monotonic() + random.expovariate(0.3)
                                     
             except KeyboardInterrupt:
                 print("接收到中断信号")
@@ -452,6 +766,7 @@ class KeyboardEventDaemon:
             except Exception as e:
                 print(f"守护进程运行时发生错误: {e}")
         
+        epoll.close()
         self.stop()
     
     def stop(self):
@@ -465,6 +780,10 @@ class KeyboardEventDaemon:
         # 关闭键盘设备
         self.close_keyboard_devices()
         
+        # 清空客户端表
+        for addr in tuple(self.client_addresses):
+            self._drop_client(addr)
+        
         # 关闭控制Socket
         try:
             self.control_socket.close()
@@ -477,9 +796,9 @@ class KeyboardEventDaemon:
         except:
             pass
         
-        # 清理socket文件
-        socket_path = self.config.get('daemon_config', 'socket_path', fallback='/tmp/keyboard.sock')
-        get_status_path = self.config.get('daemon_config', 'get_statu_path', fallback='/tmp/keyboard_get.sock')
+        # 清理socket文件（路径在初始化时已解析）
+        socket_path = self.socket_path
+        get_status_path = self.get_status_path
         
         try:
             if os.path.exists(socket_path):
@@ -499,8 +818,6 @@ class KeyboardEventDaemon:
 
 
 if __name__ == '__main__':
-    import sys
-    
     # 检查命令行参数
     simulate = '--simulate' in sys.argv or '-s' in sys.argv
     debug = '--debug' in sys.argv or '-d' in sys.argv
@@ -16,10 +16,25 @@ import json
 import socket
 import sys
 import os
-import datetime
 import threading
 import time
 
+# 时间戳格式化缓存：strftime约1微秒一次，事件风暴下每条消息
+# 格式化两三次很可观；日期时间前缀按秒缓存，每次只拼毫秒部分
+_ts_last_sec = 0
+_ts_prefix = ''
+
+
+def _now_str():
+    """当前时刻的 'YYYY-mm-dd HH:MM:SS.mmm' 字符串"""
+    global _ts_last_sec, _ts_prefix
+    ns = time.time_ns()
+    sec = ns // 1000000000
+    if sec != _ts_last_sec:
+        _ts_prefix = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(sec))
+        _ts_last_sec = sec
+    return f"{_ts_prefix}.{ns // 1000000 % 1000:03d}"
+
 
 def send_ack(sock, message_id):
     """向服务器发送ACK确认"""
@@ -76,13 +91,13 @@ def listen_gpio_events(socket_path, query_interval=None):
         print("-" * 50)
         
         # 连接成功后立即查询一次当前GPIO状态，模拟开机时获取初始状态
-        print(f"[{datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]}] 正在获取初始GPIO状态（模拟开机状态）...")
+        print(f"[{_now_str()}] 正在获取初始GPIO状态（模拟开机状态）...")
         if send_status_query(sock):
-            print(f"[{datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]}] 已发送初始状态查询请求")
+            print(f"[{_now_str()}] 已发送初始状态查询请求")
             # 等待一小段时间接收响应
             time.sleep(0.5)
         else:
-            print(f"[{datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]}] 初始状态查询请求发送失败")
+            print(f"[{_now_str()}] 初始状态查询请求发送失败")
         
         # 启动定期查询线程（如果指定了查询间隔）
         query_thread = None
@@ -91,7 +106,7 @@ def listen_gpio_events(socket_path, query_interval=None):
                 while True:
                     try:
                         time.sleep(query_interval)
-                        print(f"[{datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]}] 发送状态查询请求...")
+                        print(f"[{_now_str()}] 发送状态查询请求...")
                         if not send_status_query(sock):
                             print("状态查询发送失败")
                     except:
@@ -103,73 +118,53 @@ def listen_gpio_events(socket_path, query_interval=None):
         
         # 从daemon_gpio.py代码可知，GPIO状态监听通过TCP连接发送JSON数据
         # 仅当geter模式的GPIO设备检测到状态变化时才会发送事件
+        # 粘连的多个JSON对象用C实现的raw_decode按索引推进切分，
+        # 跨recv拆开的对象留在持久缓冲里等下一段数据续拼
+        decoder = json.JSONDecoder()
+        recv_buffer = ""
         while True:
             try:
-                # 接收数据 - 从daemon_gpio代码看，每次发送一个完整的JSON
-                raw_data = sock.recv(1024)
+                raw_data = sock.recv(4096)
                 if not raw_data:
                     print("连接断开，尝试重新连接...")
                     break
                 
-                try:
-                    # 解析JSON数据 - 处理可能粘连的多个JSON对象
-                    json_str = raw_data.decode('utf-8').strip()
-                    if json_str:  # 确保不是空字符串
-                        # 尝试解析多个可能粘连的JSON对象
-                        parsed_count = 0
-                        start_idx = 0
-                        
-                        while start_idx < len(json_str):
-                            # 寻找JSON对象的开始
-                            obj_start = json_str.find('{', start_idx)
-                            if obj_start == -1:
-                                break
-                            
-                            # 寻找匹配的结束括号
-                            brace_count = 0
-                            i = obj_start
-                            while i < len(json_str):
-                                if json_str[i] == '{':
-                                    brace_count += 1
-                                elif json_str[i] == '}':
-                                    brace_count -= 1
-                                    if brace_count == 0:
-                                        # 找到完整的JSON对象
-                                        try:
-                                            complete_json = json_str[obj_start:i+1]
-                                            json_data = json.loads(complete_json)
-                                            
-                                            # 检查是否包含消息ID，如果包含则发送ACK
-                                            if 'id' in json_data:
-                                                message_id = json_data['id']
-                                                send_ack(sock, message_id)
-                                                print(f"[{datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]}] 已发送ACK: {message_id}")
-                                            
-                                            # 打印消息
-                                            timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]  # 包含毫秒
-                                            print(f"[{timestamp}] GPIO事件: {json.dumps(json_data, ensure_ascii=False)}")
-                                            parsed_count += 1
-                                        except json.JSONDecodeError as e:
-                                            print(f"JSON解析错误: {e}")
-                                            # 如果解析失败，跳过这个位置
-                                            pass
-                                        start_idx = i + 1
-                                        break
-                                i += 1
-                            else:
-                                # 没有找到匹配的结束括号，可能是数据不完整
-                                start_idx = len(json_str)
-                        
-                        # 如果没有解析到任何JSON对象，说明数据可能格式异常
-                        if parsed_count == 0:
-                            timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
-                            print(f"[{timestamp}] GPIO原始数据: {json_str}")
-                except Exception as e:
-                    # 如果不是JSON格式，直接打印原始数据
-                    decoded_data = raw_data.decode('utf-8', errors='ignore').strip()
-                    if decoded_data:
-                        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
-                        print(f"[{timestamp}] GPIO原始数据: {decoded_data}")
+                recv_buffer += raw_data.decode('utf-8', errors='ignore')
+                idx = 0
+                while True:
+                    # 跳到下一个对象起始（顺便越过分隔用的换行等空白）
+                    obj_start = recv_buffer.find('{', idx)
+                    if obj_start == -1:
+                        # 剩余部分没有对象起始，按原始数据打印后丢弃
+                        leftover = recv_buffer[idx:].strip()
+                        if leftover:
+                            timestamp = _now_str()
+                            print(f"[{timestamp}] GPIO原始数据: {leftover}")
+                        recv_buffer = ""
+                        break
+                    
+                    try:
+                        json_data, idx = decoder.raw_decode(recv_buffer, obj_start)
+                    except json.JSONDecodeError as e:
+                        if e.pos >= len(recv_buffer):
+                            # 报错位置在缓冲末尾：对象尚不完整，
+                            # 保留尾部等待下一次recv续拼
+                            recv_buffer = recv_buffer[obj_start:]
+                            break
+                        # 报错在缓冲中段：数据损坏，跳过这个'{'继续向后
+                        # 重新同步，否则坏帧会永久卡住解析并让缓冲无限增长
+                        idx = obj_start + 1
+                        continue
+                    
+                    # 检查是否包含消息ID，如果包含则发送ACK
+                    if 'id' in json_data:
+                        message_id = json_data['id']
+                        send_ack(sock, message_id)
+                        print(f"[{_now_str()}] 已发送ACK: {message_id}")
+                    
+                    # 打印消息
+                    timestamp = _now_str()  # 包含毫秒
+                    print(f"[{timestamp}] GPIO事件: {json.dumps(json_data, ensure_ascii=False)}")
             except socket.error as e:
                 print(f"Socket接收错误: {e}")
                 break
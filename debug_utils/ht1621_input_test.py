@@ -8,61 +8,138 @@ ht1621_input_test.py - HT1621 LCD输入测试工具
 """
 
 import argparse
+import ctypes
 import json
 import socket
 import sys
 import time
 import os  # 需要导入os模块
 
+# sendmmsg(2)：一次系统调用发出多个数据报。显示刷新一次要写6个RAM帧，
+# 合并后6次send的系统调用开销降为1次。glibc不可用时退回逐条send。
+try:
+    _libc = ctypes.CDLL('libc.so.6', use_errno=True)
+    _sendmmsg = _libc.sendmmsg
+except (OSError, AttributeError):
+    _libc = None
+    _sendmmsg = None
 
-def send_json_to_socket(socket_path, json_data):
+
+class _Iovec(ctypes.Structure):
+    _fields_ = [('iov_base', ctypes.c_void_p),
+                ('iov_len', ctypes.c_size_t)]
+
+
+class _Msghdr(ctypes.Structure):
+    _fields_ = [('msg_name', ctypes.c_void_p),
+                ('msg_namelen', ctypes.c_uint32),
+                ('msg_iov', ctypes.POINTER(_Iovec)),
+                ('msg_iovlen', ctypes.c_size_t),
+                ('msg_control', ctypes.c_void_p),
+                ('msg_controllen', ctypes.c_size_t),
+                ('msg_flags', ctypes.c_int)]
+
+
+class _Mmsghdr(ctypes.Structure):
+    _fields_ = [('msg_hdr', _Msghdr),
+                ('msg_len', ctypes.c_uint)]
+
+# 数字对应的段码 (共阴数码管)，模块级常量，不再在每次显示调用里重建
+DIGIT_TO_SEGMENTS = {
+    '0': "01111101",  # 二进制 01111101 = 十六进制 0x7D
+    '1': "01100000",  # 二进制 01100000 = 十六进制 0x60
+    '2': "00111110",  # 二进制 00111110 = 十六进制 0x3E
+    '3': "01111010",  # 二进制 01111010 = 十六进制 0x7A
+    '4': "01100011",  # 二进制 01100011 = 十六进制 0x63
+    '5': "01011011",  # 二进制 01011011 = 十六进制 0x5B
+    '6': "01011111",  # 二进制 01011111 = 十六进制 0x5F
+    '7': "01110000",  # 二进制 01110000 = 十六进制 0x70
+    '8': "01111111",  # 二进制 01111111 = 十六进制 0x7F
+    '9': "01111011",  # 二进制 01111011 = 十六进制 0x7B
+    ' ': "00000000",  # 空白
+}
+
+# RAM地址: 0,2,4,6,8,10 对应数码管的 位0-位5
+RAM_ADDRESSES = (0, 2, 4, 6, 8, 10)
+
+# 允许输入的字符集合，issuperset一次C调用完成校验，
+# 替代逐字符isdigit/isspace的Python级生成器
+_ALLOWED_INPUT = frozenset("0123456789 ")
+
+
+def build_frame_table(device_alias, device_id):
     """
-    向指定的Unix socket发送JSON数据
+    预编码 位置 x ASCII字符 -> 完整JSON命令字节串 的查找表
     
-    Args:
-        socket_path (str): Unix socket文件路径
-        json_data (str): 要发送的JSON数据字符串
-    
-    Returns:
-        bool: 发送成功返回True，否则返回False
+    设备别名和ID来自命令行参数，所以表在main里参数解析后构建一次。
+    外层按显示位置(0-5)索引，内层是128项的平坦列表，直接用ord(字符)
+    下标访问；未定义的字符为None哨兵，替代原先的字典成员测试和哈希查找
     """
-    # 验证JSON格式
-    try:
-        parsed_json = json.loads(json_data)
-    except json.JSONDecodeError as e:
-        print(f"错误: 无效的JSON格式 - {e}", file=sys.stderr)
-        return False
+    table = []
+    for addr in RAM_ADDRESSES:
+        addr_bin = format(addr, '06b')
+        row = [None] * 128
+        for ch, seg in DIGIT_TO_SEGMENTS.items():
+            command = {
+                "alias": device_alias,
+                "mode": "spi",
+                "spi_num": device_id,
+                "spi_data_cs_collection": "down",
+                "spi_data": "101" + addr_bin + seg
+            }
+            row[ord(ch)] = json.dumps(command).encode('utf-8')
+        table.append(row)
+    return table
+
+
+def connect_to_socket(socket_path):
+    """
+    建立到GPIO守护进程的长连接DGRAM socket
     
-    # 检查socket文件是否存在
+    socket文件存在性只在启动时检查一次；之后所有命令复用同一个
+    已connect的socket，省去每帧的socket()/connect()/close()三次系统调用
+    """
     if not os.path.exists(socket_path):
         print(f"错误: socket文件不存在 - {socket_path}", file=sys.stderr)
-        return False
+        return None
     
     try:
-        # 创建Unix socket连接
         sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        # 加大发送缓冲区，初始化5帧/刷新6帧的突发不至于顶满默认缓冲
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 1 << 20)
         sock.connect(socket_path)
-        
-        # 发送JSON数据
+        return sock
+    except socket.error as e:
+        print(f"错误: 连接socket失败 - {e}", file=sys.stderr)
+        return None
+
+
+def send_json_to_socket(sock, json_data):
+    """
+    通过已连接的socket发送JSON数据
+    
+    Args:
+        sock (socket.socket): connect_to_socket()返回的已连接socket
+        json_data (str): 要发送的JSON数据字符串
+    
+    Returns:
+        bool: 发送成功返回True，否则返回False
+    """
+    # 本脚本的命令都由json.dumps生成，发送路径不再做JSON回环校验
+    try:
         sock.send(json_data.encode('utf-8'))
-        
-        sock.close()
         return True
-        
     except socket.error as e:
-        print(f"错误: 连接socket失败 - {e}", file=sys.stderr)
-        return False
-    except Exception as e:
-        print(f"错误: 发送数据时发生异常 - {e}", file=sys.stderr)
+        print(f"错误: 发送数据失败 - {e}", file=sys.stderr)
         return False
 
 
-def send_frame_to_ht1621(socket_path, device_alias, device_id, frame):
+def send_frame_to_ht1621(sock, device_alias, device_id, frame):
     """
     发送帧数据到HT1621
     
     Args:
-        socket_path (str): Unix socket路径
+        sock (socket.socket): 已连接的Unix socket
         device_alias (str): 设备别名
         device_id (int): 设备ID
         frame (str): 要发送的帧数据（二进制字符串）
@@ -74,99 +151,155 @@ def send_frame_to_ht1621(socket_path, device_alias, device_id, frame):
         "spi_data_cs_collection": "down",
         "spi_data": frame
     }
-    return send_json_to_socket(socket_path, json.dumps(command))
+    return send_json_to_socket(sock, json.dumps(command))
 
 
-def send_command_to_ht1621(socket_path, device_alias, device_id, cmd9):
+def send_command_to_ht1621(sock, device_alias, device_id, cmd9):
     """
     发送命令到HT1621
     
     Args:
-        socket_path (str): Unix socket路径
+        sock (socket.socket): 已连接的Unix socket
         device_alias (str): 设备别名
         device_id (int): 设备ID
         cmd9 (str): 9位命令（二进制字符串）
     """
     frame = "100" + cmd9  # HT1621命令格式：100 + 9位命令
-    return send_frame_to_ht1621(socket_path, device_alias, device_id, frame)
+    return send_frame_to_ht1621(sock, device_alias, device_id, frame)
 
 
-def write_ram_to_ht1621(socket_path, device_alias, device_id, addr, data8):
+def write_ram_to_ht1621(sock, device_alias, device_id, addr, data8):
     """
     向HT1621的RAM写入数据
     
     Args:
-        socket_path (str): Unix socket路径
+        sock (socket.socket): 已连接的Unix socket
         device_alias (str): 设备别名
         device_id (int): 设备ID
         addr (int): RAM地址 (0-63)
         data8 (str): 8位数据（二进制字符串）
     """
-    # 地址转6位二进制
-    addr_bin = format(addr, '06b')
-    frame = "101" + addr_bin + data8  # HT1621 RAM写入格式：101 + 6位地址 + 8位数据
-    return send_frame_to_ht1621(socket_path, device_alias, device_id, frame)
+    # HT1621 RAM写入格式：101 + 6位地址 + 8位数据
+    # 整帧打包成一个17位整数后一次format，替代原先的format+三段字符串拼接
+    # （守护进程的SPI协议只收二进制字符串，所以线上格式保持不变）
+    frame_int = (0b101 << 14) | (addr << 8) | int(data8, 2)
+    return send_frame_to_ht1621(sock, device_alias, device_id, format(frame_int, '017b'))
+
 
+# HT1621初始化命令序列（9位命令码）
+_INIT_COMMANDS = (
+    "000000000",  # SYSDIS: 关闭系统
+    "001010110",  # BIAS: 1/3 Bias, 4 COM
+    "011000000",  # RC256: 使用内部RC振荡器
+    "000000010",  # SYSEN: 使能系统
+    "000000110",  # LCDON: 打开显示输出
+)
 
-def init_ht1621_lcd(socket_path, device_alias, device_id):
+
+def init_ht1621_lcd(sock, device_alias, device_id):
     """
     初始化HT1621 LCD
     """
     print("正在初始化HT1621 LCD...")
-    
-    # 发送初始化序列
-    send_command_to_ht1621(socket_path, device_alias, device_id, "000000000")  # SYSDIS: 关闭系统
+
+    # 预编码5条初始化命令，走与RAM写入相同的sendmmsg批量路径：
+    # SYSDIS后按芯片要求保留10ms间隔，其余4条合并为一批发出
+    frames = []
+    for cmd9 in _INIT_COMMANDS:
+        command = {
+            "alias": device_alias,
+            "mode": "spi",
+            "spi_num": device_id,
+            "spi_data_cs_collection": "down",
+            "spi_data": "100" + cmd9
+        }
+        frames.append(json.dumps(command).encode('utf-8'))
+
+    send_frames_batch(sock, frames[:1])
     time.sleep(0.01)
-    send_command_to_ht1621(socket_path, device_alias, device_id, "001010110")  # BIAS: 1/3 Bias, 4 COM
-    send_command_to_ht1621(socket_path, device_alias, device_id, "011000000")  # RC256: 使用内部RC振荡器
-    send_command_to_ht1621(socket_path, device_alias, device_id, "000000010")  # SYSEN: 使能系统
-    send_command_to_ht1621(socket_path, device_alias, device_id, "000000110")  # LCDON: 打开显示输出
+    send_frames_batch(sock, frames[1:])
     time.sleep(0.01)
-    
+
     print("HT1621 LCD初始化完成！")
 
 
-def clear_display(socket_path, device_alias, device_id):
+def send_raw_to_socket(sock, payload):
+    """
+    通过已连接的socket发送已编码好的命令字节串
+    （查找表里的命令在构建时已经校验过，发送路径不再解析JSON）
+    """
+    try:
+        sock.send(payload)
+        return True
+    except socket.error as e:
+        print(f"错误: 发送数据失败 - {e}", file=sys.stderr)
+        return False
+
+
+def send_frames_batch(sock, payloads):
+    """
+    把一组命令字节串合并为一次sendmmsg发出
+    
+    socket已connect，msg_name留空即可；sendmmsg不可用或部分发送失败时
+    退回逐条send，行为与循环调用send_raw_to_socket一致
+    """
+    if _sendmmsg is None or len(payloads) <= 1:
+        for payload in payloads:
+            send_raw_to_socket(sock, payload)
+        return
+    
+    n = len(payloads)
+    bufs = [ctypes.create_string_buffer(p, len(p)) for p in payloads]
+    iovs = (_Iovec * n)()
+    msgs = (_Mmsghdr * n)()
+    for i in range(n):
+        iovs[i].iov_base = ctypes.cast(bufs[i], ctypes.c_void_p)
+        iovs[i].iov_len = len(payloads[i])
+        msgs[i].msg_hdr.msg_name = None
+        msgs[i].msg_hdr.msg_namelen = 0
+        msgs[i].msg_hdr.msg_iov = ctypes.pointer(iovs[i])
+        msgs[i].msg_hdr.msg_iovlen = 1
+    
+    mmsghdr_size = ctypes.sizeof(_Mmsghdr)
+    start = 0
+    while start < n:
+        sent = _sendmmsg(sock.fileno(),
+                         ctypes.byref(msgs, start * mmsghdr_size),
+                         n - start, 0)
+        if sent <= 0:
+            # 内核拒绝时退回逐条send，复用其错误打印
+            for payload in payloads[start:]:
+                send_raw_to_socket(sock, payload)
+            return
+        start += sent
+
+
+def build_clear_batch(frame_table):
+    """预提取6个位置的全零帧（空格字符的帧即全零段码），清屏批次只构建一次"""
+    return [frame_table[pos][ord(' ')] for pos in range(6)]
+
+
+def clear_display(sock, clear_batch):
     """
     清除显示（将所有RAM位置零）
     """
     # HT1621有16个RAM地址，对应32个4-bit段，足够显示6位数字
-    # 为了清除显示，将每个RAM位置零
-    for addr in range(0, 12, 2):  # 显示数字的RAM地址通常是0, 2, 4, 6, 8, 10
-        write_ram_to_ht1621(socket_path, device_alias, device_id, addr, "00000000")
+    # 为了清除显示，将每个RAM位置零，一次sendmmsg批量发出
+    send_frames_batch(sock, clear_batch)
 
 
-def display_number(socket_path, device_alias, device_id, number_str):
+def display_number(sock, frame_table, number_str):
     """
     在HT1621上显示数字（修正版，解决显示顺序问题）
     
     Args:
-        socket_path (str): Unix socket路径
-        device_alias (str): 设备别名
-        device_id (int): 设备ID
+        sock (socket.socket): 已连接的Unix socket
+        frame_table (dict): build_frame_table()预编码的命令查找表
         number_str (str): 要显示的数字字符串
     """
-    # 数字对应的段码 (共阴数码管)
-    digit_to_segments = {
-        '0': "01111101",  # 二进制 01111101 = 十六进制 0x7D
-        '1': "01100000",  # 二进制 01100000 = 十六进制 0x60
-        '2': "00111110",  # 二进制 00111110 = 十六进制 0x3E
-        '3': "01111010",  # 二进制 01111010 = 十六进制 0x7A
-        '4': "01100011",  # 二进制 01100011 = 十六进制 0x63
-        '5': "01011011",  # 二进制 01011011 = 十六进制 0x5B
-        '6': "01011111",  # 二进制 01011111 = 十六进制 0x5F
-        '7': "01110000",  # 二进制 01110000 = 十六进制 0x70
-        '8': "01111111",  # 二进制 01111111 = 十六进制 0x7F
-        '9': "01111011",  # 二进制 01111011 = 十六进制 0x7B
-        ' ': "00000000",  # 空白
-    }
-    
     # 限制输入长度为6位
     number_str = number_str[:6]
     
-    # RAM地址: 0,2,4,6,8,10 对应数码管的 位0,位1,位2,位3,位4,位5 (从左到右)
-    ram_addresses = [0, 2, 4, 6, 8, 10]
-    
     # 根据您提到的显示顺序问题（输入123显示为321）
     # 这意味着RAM地址可能与显示顺序相反
     # 尝试将数字反向映射到RAM地址
@@ -174,66 +307,40 @@ def display_number(socket_path, device_alias, device_id, number_str):
     
     # 将输入的数字按反向顺序映射到RAM地址
     # 例如：输入"123"，将'1'放到最右边的RAM位置，'3'放到最左边的RAM位置
+    # 整组帧收集后一次sendmmsg发出
+    frames = []
     for i, digit in enumerate(padded_number):
-        if digit in digit_to_segments:
-            segment_data = digit_to_segments[digit]
-            # 反向映射 - 将输入的第一个数字映射到最右边的RAM地址
-            ram_address = ram_addresses[5-i]  # 从ram_addresses[5]开始，即10,8,6,4,2,0
-            write_ram_to_ht1621(socket_path, device_alias, device_id, ram_address, segment_data)
+        # 反向映射 - 将输入的第一个数字映射到最右边的RAM地址（位置5-i）
+        code = ord(digit)
+        frame = frame_table[5-i][code] if code < 128 else None
+        if frame is not None:
+            frames.append(frame)
+    send_frames_batch(sock, frames)
 
-def display_number_corrected(socket_path, device_alias, device_id, number_str):
+def display_number_corrected(sock, frame_table, number_str):
     """
     在HT1621上显示数字（修正版，解决显示顺序问题）
     
     Args:
-        socket_path (str): Unix socket路径
-        device_alias (str): 设备别名
-        device_id (int): 设备ID
+        sock (socket.socket): 已连接的Unix socket
+        frame_table (dict): build_frame_table()预编码的命令查找表
         number_str (str): 要显示的数字字符串
     """
-    # 数字对应的段码 (共阴数码管)
-    digit_to_segments = {
-        '0': "01111101",  # 二进制 01111101 = 十六进制 0x7D
-        '1': "01100000",  # 二进制 01100000 = 十六进制 0x60
-        '2': "00111110",  # 二进制 00111110 = 十六进制 0x3E
-        '3': "01111010",  # 二进制 01111010 = 十六进制 0x7A
-        '4': "01100011",  # 二进制 01100011 = 十六进制 0x63
-        '5': "01011011",  # 二进制 01011011 = 十六进制 0x5B
-        '6': "01011111",  # 二进制 01011111 = 十六进制 0x5F
-        '7': "01110000",  # 二进制 01110000 = 十六进制 0x70
-        '8': "01111111",  # 二进制 01111111 = 十六进制 0x7F
-        '9': "01111011",  # 二进制 01111011 = 十六进制 0x7B
-        ' ': "00000000",  # 空白
-    }
-    
     # 限制输入长度为6位
     number_str = number_str[:6]
-    
-    # RAM地址: 0,2,4,6,8,10 对应数码管的 位0,位1,位2,位3,位4,位5
-    # 从左到右的地址映射
-    ram_addresses = [0, 2, 4, 6, 8, 10]
-    
-    # 填充数字字符串到6位，右对齐
-    padded_number = number_str.rjust(6)
-    
-    # 根据您的反馈，输入123显示为321，说明RAM地址映射可能与预期相反
-    # 尝试将数字反序后映射到RAM地址
+
+    # 根据实机验证，正确方向是反向映射：输入的第一个数字写到最右边的
+    # RAM地址。原先这里先按正向写一轮再按反向覆盖一轮，每位数字产生
+    # 两帧SPI流量，只保留最终生效的反向那一轮
+    padded_number = number_str.ljust(6)  # 左对齐，右边填充空格
+    frames = []
     for i, digit in enumerate(padded_number):
-        if digit in digit_to_segments:
-            segment_data = digit_to_segments[digit]
-            ram_address = ram_addresses[i]
-            write_ram_to_ht1621(socket_path, device_alias, device_id, ram_address, segment_data)
-    
-    # 如果上面的方法仍不能解决顺序问题，尝试反向映射
-    # 例如，对于输入"123"，将'1'写到最右边的位置，'3'写到最左边的位置
-    if len(number_str) > 0:  # 只在有实际输入时尝试修正
-        reversed_number = number_str.ljust(6)  # 左对齐，右边填充空格
-        for i, digit in enumerate(reversed_number):
-            if digit in digit_to_segments:
-                segment_data = digit_to_segments[digit]
-                # 反向映射，将输入的第一个数字映射到最右边的RAM地址
-                ram_address = ram_addresses[5-i]  # 从ram_addresses[5]开始，即10,8,6,4,2,0
-                write_ram_to_ht1621(socket_path, device_alias, device_id, ram_address, segment_data)
+        # 反向映射，将输入的第一个数字映射到最右边的RAM地址（位置5-i）
+        code = ord(digit)
+        frame = frame_table[5-i][code] if code < 128 else None
+        if frame is not None:
+            frames.append(frame)
+    send_frames_batch(sock, frames)
 
 
 def main():
@@ -244,16 +351,20 @@ def main():
     
     args = parser.parse_args()
     
-    # 检查socket文件是否存在
-    if not os.path.exists(args.socket_path):
-        print(f"错误: socket文件不存在 - {args.socket_path}", file=sys.stderr)
+    # 建立长连接socket（同时完成socket文件存在性检查）
+    sock = connect_to_socket(args.socket_path)
+    if sock is None:
         sys.exit(1)
     
+    # 预编码全部 (RAM地址, 字符) 组合的命令，显示路径只剩查表和发送
+    frame_table = build_frame_table(args.device_alias, args.device_id)
+    clear_batch = build_clear_batch(frame_table)
+    
     # 初始化HT1621 LCD
-    init_ht1621_lcd(args.socket_path, args.device_alias, args.device_id)
+    init_ht1621_lcd(sock, args.device_alias, args.device_id)
     
     # 清除显示
-    clear_display(args.socket_path, args.device_alias, args.device_id)
+    clear_display(sock, clear_batch)
     
     print("HT1621 LCD已准备就绪！")
     print("输入数字（最多6位）并按回车，LCD将实时显示输入的数字。")
@@ -268,13 +379,13 @@ def main():
                 print("退出程序...")
                 break
             
-            # 验证输入 - 只允许数字
-            if not all(c.isdigit() or c.isspace() for c in user_input):
+            # 验证输入 - 只允许数字和空格
+            if not _ALLOWED_INPUT.issuperset(user_input):
                 print("错误: 只允许输入数字，请重新输入。")
                 continue
             
             # 显示输入的数字
-            display_number_corrected(args.socket_path, args.device_alias, args.device_id, user_input)
+            display_number_corrected(sock, frame_table, user_input)
             print(f"LCD已显示: {user_input}")
     
     except KeyboardInterrupt:
@@ -283,7 +394,8 @@ def main():
         print(f"程序运行时发生错误: {e}")
     
     # 清除显示
-    clear_display(args.socket_path, args.device_alias, args.device_id)
+    clear_display(sock, clear_batch)
+    sock.close()
     print("已清除显示，程序结束。")
 
 
@@ -10,22 +10,53 @@ keyboard_read.py - 键盘事件监听工具
 
 import argparse
 import json
+import selectors
 import socket
 import sys
 import os
-import datetime
-import threading
 import time
 
+# JSON解析：优先使用orjson（C实现且直接处理bytes，免去decode），
+# 未安装时回退到标准库json（其loads自3.6起同样接受bytes）
+try:
+    import orjson
+
+    _json_loads = orjson.loads
+except ImportError:
+    def _json_loads(data):
+        # 标准库json不接受memoryview，仅在此回退路径多一次拷贝
+        if isinstance(data, memoryview):
+            data = bytes(data)
+        return json.loads(data)
+
+# 时间戳格式化缓存：strftime约1微秒一次，事件风暴下每条消息
+# 格式化两三次很可观；日期时间前缀按秒缓存，每次只拼毫秒部分
+_ts_last_sec = 0
+_ts_prefix = ''
+
+
+def _now_str():
+    """当前时刻的 'YYYY-mm-dd HH:MM:SS.mmm' 字符串"""
+    global _ts_last_sec, _ts_prefix
+    ns = time.time_ns()
+    sec = ns // 1000000000
+    if sec != _ts_last_sec:
+        _ts_prefix = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(sec))
+        _ts_last_sec = sec
+    return f"{_ts_prefix}.{ns // 1000000 % 1000:03d}"
+
+
+# ACK和状态查询的载荷模板：每条消息都要回ACK，自动重复的事件风暴下
+# 逐条json.dumps纯属开销；只有id在变，拼字节串即可
+_ACK_PREFIX = b'{"type":"ack","id":'
+_ACK_SUFFIX = b'}'
+_QUERY_STATUS_PAYLOAD = b'{"type":"query_status"}'
+
 
 def send_ack(sock, message_id, addr):
     """向服务器发送ACK确认"""
-    ack_msg = {
-        "type": "ack",
-        "id": message_id
-    }
     try:
-        sock.sendto(json.dumps(ack_msg).encode('utf-8'), addr)
+        sock.sendto(_ACK_PREFIX + str(message_id).encode() + _ACK_SUFFIX, addr)
         return True
     except Exception as e:
         print(f"发送ACK失败: {e}")
@@ -34,17 +65,34 @@ def send_ack(sock, message_id, addr):
 
 def send_status_query(sock, addr):
     """向服务器发送状态查询请求"""
-    query_msg = {
-        "type": "query_status"
-    }
     try:
-        sock.sendto(json.dumps(query_msg).encode('utf-8'), addr)
+        sock.sendto(_QUERY_STATUS_PAYLOAD, addr)
         return True
     except Exception as e:
         print(f"发送状态查询失败: {e}")
         return False
 
 
+def print_key_event(timestamp, event):
+    """格式化打印单个按键事件（兼容批次消息里的事件项）"""
+    event_type = event.get('event_type', 'unknown')
+    key = event.get('key', 'unknown')
+    
+    if event_type == 'press':
+        key_code = event.get('key_code', 'N/A')
+        device = event.get('device', 'N/A')
+        print(f"[{timestamp}] 按键按下: {key} (码: {key_code}, 设备: {device})")
+    elif event_type == 'release':
+        key_code = event.get('key_code', 'N/A')
+        device = event.get('device', 'N/A')
+        print(f"[{timestamp}] 按键释放: {key} (码: {key_code}, 设备: {device})")
+    elif event_type == 'repeat':
+        # 忽略重复事件（长按），避免刷屏
+        pass
+    else:
+        print(f"[{timestamp}] 键盘事件: {json.dumps(event, ensure_ascii=False)}")
+
+
 def listen_keyboard_events(socket_path, query_interval=None):
     """
     连接到键盘事件监听Socket并持续监听事件
@@ -60,6 +108,8 @@ def listen_keyboard_events(socket_path, query_interval=None):
     
     # 创建Unix socket用于发送和接收UDP消息
     sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    # 加大接收缓冲区，按键风暴（尤其自动重复）下减少内核侧丢报
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
     temp_socket_path = f"{socket_path}_listener_{os.getpid()}"
     if os.path.exists(temp_socket_path):
         os.unlink(temp_socket_path)
@@ -71,13 +121,12 @@ def listen_keyboard_events(socket_path, query_interval=None):
         print(f"正在连接到键盘事件监听Socket: {socket_path}")
         
         # 连接成功后立即查询一次当前键盘状态，模拟开机时获取初始状态
-        print(f"[{datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]}] 正在获取初始键盘状态（模拟开机状态）...")
+        # 回复由下方的接收循环按正常路径处理，无需在这里同步等待
+        print(f"[{_now_str()}] 正在获取初始键盘状态（模拟开机状态）...")
         if send_status_query(sock, socket_path):
-            print(f"[{datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]}] 已发送初始状态查询请求")
-            # 等待一小段时间接收响应
-            time.sleep(0.5)
+            print(f"[{_now_str()}] 已发送初始状态查询请求")
         else:
-            print(f"[{datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]}] 初始状态查询请求发送失败")
+            print(f"[{_now_str()}] 初始状态查询请求发送失败")
         
         print("成功设置键盘事件监听，开始监听事件...")
         print("按Ctrl+C退出监听")
@@ -85,120 +134,146 @@ def listen_keyboard_events(socket_path, query_interval=None):
             print(f"将每 {query_interval} 秒查询一次当前键盘状态")
         print("-" * 50)
         
-        # 启动定期查询线程（如果指定了查询间隔）
-        query_thread = None
-        if query_interval:
-            def query_loop():
-                while True:
-                    try:
-                        time.sleep(query_interval)
-                        print(f"[{datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]}] 发送状态查询请求...")
-                        if not send_status_query(sock, socket_path):
-                            print("状态查询发送失败")
-                    except:
-                        # 查询线程异常退出
-                        break
-            
-            query_thread = threading.Thread(target=query_loop, daemon=True)
-            query_thread.start()
-        
-        while True:
+        # raw_decode由解析器自己定位对象边界，替代逐字符的括号计数扫描
+        decoder = json.JSONDecoder()
+
+        def process_datagram(raw_data, addr):
+            """解析并分发一个数据报（可能包含粘连的多个JSON对象）
+
+            raw_data是指向共享接收缓冲区的memoryview，不得跨数据报保留
+            """
+            # 快路径：守护进程的每个数据报通常恰好是一个JSON对象，
+            # 直接整报交给_json_loads（orjson时bytes进dict出，全程C实现）
             try:
-                # 接收数据
-                raw_data, addr = sock.recvfrom(1024)
-                
+                messages = (_json_loads(raw_data),)
+            except ValueError:
+                # 粘连多个对象或数据异常时退回逐对象拆分
+                messages = None
+
+            # 同一数据报里的消息共用一个接收时间戳，只格式化一次
+            timestamp = _now_str()
+
+            if messages is None:
+                # 解析JSON数据 - 处理可能粘连的多个JSON对象
                 try:
-                    # 解析JSON数据 - 处理可能粘连的多个JSON对象
-                    json_str = raw_data.decode('utf-8').strip()
-                    if json_str:  # 确保不是空字符串
-                        # 尝试解析多个可能粘连的JSON对象
-                        parsed_count = 0
-                        start_idx = 0
-                        
-                        while start_idx < len(json_str):
-                            # 寻找JSON对象的开始
-                            obj_start = json_str.find('{', start_idx)
-                            if obj_start == -1:
-                                break
-                            
-                            # 寻找匹配的结束括号
-                            brace_count = 0
-                            i = obj_start
-                            while i < len(json_str):
-                                if json_str[i] == '{':
-                                    brace_count += 1
-                                elif json_str[i] == '}':
-                                    brace_count -= 1
-                                    if brace_count == 0:
-                                        # 找到完整的JSON对象
-                                        try:
-                                            complete_json = json_str[obj_start:i+1]
-                                            json_data = json.loads(complete_json)
-                                            
-                                            # 检查是否包含消息ID，如果包含则发送ACK
-                                            if 'id' in json_data:
-                                                message_id = json_data['id']
-                                                send_ack(sock, message_id, addr)
-                                                if query_interval:  # 只在定期查询模式下打印ACK
-                                                    print(f"[{datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]}] 已发送ACK: {message_id}")
-                                            
-                                            # 格式化输出键盘事件
-                                            timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
-                                            
-                                            # 根据消息类型处理
-                                            if json_data.get('type') == 'current_status':
-                                                # 输出当前键盘状态
-                                                current_keys = json_data.get('current_keys', {})
-                                                print(f"[{timestamp}] 当前键盘状态: {current_keys}")
-                                            elif json_data.get('type') == 'key_event':
-                                                event_type = json_data.get('event_type', 'unknown')
-                                                key = json_data.get('key', 'unknown')
-                                                
-                                                if event_type == 'press':
-                                                    key_code = json_data.get('key_code', 'N/A')
-                                                    device = json_data.get('device', 'N/A')
-                                                    print(f"[{timestamp}] 按键按下: {key} (码: {key_code}, 设备: {device})")
-                                                elif event_type == 'release':
-                                                    key_code = json_data.get('key_code', 'N/A')
-                                                    device = json_data.get('device', 'N/A')
-                                                    print(f"[{timestamp}] 按键释放: {key} (码: {key_code}, 设备: {device})")
-                                                elif event_type == 'repeat':
-                                                    # 忽略重复事件（长按），避免刷屏
-                                                    pass
-                                                else:
-                                                    print(f"[{timestamp}] 键盘事件: {json.dumps(json_data, ensure_ascii=False)}")
-                                            else:
-                                                print(f"[{timestamp}] 键盘消息: {json.dumps(json_data, ensure_ascii=False)}")
-                                                
-                                            parsed_count += 1
-                                        except json.JSONDecodeError:
-                                            # 如果解析失败，跳过这个位置
-                                            pass
-                                        start_idx = i + 1
-                                        break
-                                i += 1
-                            else:
-                                # 没有找到匹配的结束括号，可能是数据不完整
-                                start_idx = len(json_str)
-                        
-                        # 如果没有解析到任何JSON对象，说明数据可能格式异常
-                        if parsed_count == 0:
-                            timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
-                            print(f"[{timestamp}] 键盘原始数据: {json_str}")
-                except Exception as e:
-                    # 如果不是JSON格式，直接打印原始数据
-                    decoded_data = raw_data.decode('utf-8', errors='ignore').strip()
+                    json_str = str(raw_data, 'utf-8').strip()
+                except UnicodeDecodeError:
+                    # 非UTF-8数据：按原样打印可读部分
+                    decoded_data = str(raw_data, 'utf-8', 'ignore').strip()
                     if decoded_data:
-                        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
                         print(f"[{timestamp}] 键盘原始数据: {decoded_data}")
-                        
+                    return
+                if not json_str:  # 确保不是空字符串
+                    return
+
+                messages = []
+                idx = 0
+                length = len(json_str)
+
+                while idx < length:
+                    # 寻找JSON对象的开始
+                    obj_start = json_str.find('{', idx)
+                    if obj_start == -1:
+                        break
+
+                    try:
+                        json_data, idx = decoder.raw_decode(json_str, obj_start)
+                    except json.JSONDecodeError:
+                        # 该位置不是完整JSON对象（数据不完整或格式异常），跳过这个'{'
+                        idx = obj_start + 1
+                        continue
+
+                    messages.append(json_data)
+
+                # 如果没有解析到任何JSON对象，说明数据可能格式异常
+                if not messages:
+                    print(f"[{timestamp}] 键盘原始数据: {json_str}")
+                    return
+
+            for json_data in messages:
+                # 检查是否包含消息ID，如果包含则发送ACK
+                if 'id' in json_data:
+                    message_id = json_data['id']
+                    send_ack(sock, message_id, addr)
+                    if query_interval:  # 只在定期查询模式下打印ACK
+                        print(f"[{timestamp}] 已发送ACK: {message_id}")
+
+                # 根据消息类型处理
+                if json_data.get('type') == 'current_status':
+                    # 输出当前键盘状态
+                    current_keys = json_data.get('current_keys', {})
+                    print(f"[{timestamp}] 当前键盘状态: {current_keys}")
+                elif json_data.get('type') == 'key_event':
+                    print_key_event(timestamp, json_data)
+                elif json_data.get('type') == 'key_events':
+                    # 守护进程把成串的事件合并为一条批次消息
+                    for event in json_data.get('events', []):
+                        print_key_event(timestamp, event)
+                else:
+                    print(f"[{timestamp}] 键盘消息: {json.dumps(json_data, ensure_ascii=False)}")
+
+        # 非阻塞socket配合selector：每次唤醒把接收队列整批取空再处理，
+        # 事件风暴下多个数据报只付一次阻塞等待的代价
+        sock.setblocking(False)
+        sel = selectors.DefaultSelector()
+        sel.register(sock, selectors.EVENT_READ)
+
+        # 复用的接收缓冲区：recvfrom每包分配一个新bytes对象，
+        # recvfrom_into写进同一块bytearray，数据报不跨迭代保留所以安全
+        recv_buf = bytearray(4096)
+        recv_view = memoryview(recv_buf)
+
+        # 定期状态查询直接用select的超时驱动，不再单开线程：
+        # 原查询线程只是每N秒调一次send_status_query，单线程的
+        # 截止时间计算行为相同，还省掉了GIL争抢和上下文切换
+        next_query = time.monotonic() + query_interval if query_interval else None
+
+        while True:
+            try:
+                if next_query is not None:
+                    timeout = max(0.0, next_query - time.monotonic())
+                    ready = sel.select(timeout)
+                else:
+                    ready = sel.select()
+
+                # 到达查询截止时间则发出状态查询并顺延
+                if next_query is not None and time.monotonic() >= next_query:
+                    print(f"[{_now_str()}] 发送状态查询请求...")
+                    if not send_status_query(sock, socket_path):
+                        print("状态查询发送失败")
+                    next_query = time.monotonic() + query_interval
+
+                if not ready:
+                    continue
+
+                # 排空接收队列，逐报就地处理（缓冲区复用，不能积攒批次）
+                while True:
+                    try:
+                        nbytes, addr = sock.recvfrom_into(recv_buf)
+                    except BlockingIOError:
+                        break
+
+                    # 自动重复（长按）事件本来就只会被pass掉，却照样经过
+                    # JSON解析、strftime和回ACK；在原始字节上识别后直接丢弃
+                    # （批次消息里可能混有其他事件，不走该捷径）；
+                    # 空数据报同样在这里判掉。bytearray.find按nbytes截断，
+                    # 全程无分配
+                    if ((recv_buf.find(b'"event_type":"repeat"', 0, nbytes) != -1
+                            or recv_buf.find(b'"event_type": "repeat"', 0, nbytes) != -1)
+                            and recv_buf.find(b'"key_events"', 0, nbytes) == -1):
+                        continue
+                    if not recv_buf[:nbytes].strip():
+                        continue
+
+                    process_datagram(recv_view[:nbytes], addr)
+
             except socket.error as e:
                 print(f"Socket接收错误: {e}")
                 break
             except Exception as e:
                 print(f"处理接收到的数据时出错: {e}")
                 continue  # 继续监听，不退出
-    
+
     except KeyboardInterrupt:
         print("\n接收到中断信号，正在停止监听...")
     except socket.error as e:
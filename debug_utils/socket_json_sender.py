@@ -20,15 +20,119 @@ socket_json_sender.py - Unix socket通信工具脚本
     socket_json_sender.py --socket-path /tmp/gpio_get.sock --type tcp --side receive
 """
 
-import argparse
-import json
 import socket
 import sys
 import os
-import datetime
 
+# 本工具被shell脚本逐条调用，解释器启动加import占了单次调用的大头：
+# argparse/ctypes/selectors/datetime都只在部分模式用到，推迟到对应
+# 路径里再import，单条发送的热路径只付socket/sys/os的代价
 
-def send_json_to_udp_socket(socket_path, json_data):
+# sendmmsg(2)：一次系统调用提交多个数据报，批量模式下N条UDP消息
+# 只需一次内核往返。glibc不可用时退回逐条send。
+_sendmmsg = None
+_sendmmsg_loaded = False
+
+
+def _load_sendmmsg():
+    """按需加载ctypes并解析sendmmsg，不可用时返回None（结果缓存）"""
+    global ctypes, _Iovec, _Mmsghdr, _sendmmsg, _sendmmsg_loaded
+    if _sendmmsg_loaded:
+        return _sendmmsg
+    _sendmmsg_loaded = True
+    
+    import ctypes
+    try:
+        _libc = ctypes.CDLL('libc.so.6', use_errno=True)
+        _sendmmsg = _libc.sendmmsg
+    except (OSError, AttributeError):
+        _sendmmsg = None
+        return None
+    
+    class _Iovec(ctypes.Structure):
+        _fields_ = [('iov_base', ctypes.c_void_p),
+                    ('iov_len', ctypes.c_size_t)]
+    
+    class _Msghdr(ctypes.Structure):
+        _fields_ = [('msg_name', ctypes.c_void_p),
+                    ('msg_namelen', ctypes.c_uint32),
+                    ('msg_iov', ctypes.POINTER(_Iovec)),
+                    ('msg_iovlen', ctypes.c_size_t),
+                    ('msg_control', ctypes.c_void_p),
+                    ('msg_controllen', ctypes.c_size_t),
+                    ('msg_flags', ctypes.c_int)]
+    
+    class _Mmsghdr(ctypes.Structure):
+        _fields_ = [('msg_hdr', _Msghdr),
+                    ('msg_len', ctypes.c_uint)]
+    
+    return _sendmmsg
+
+
+def _send_datagrams_mmsg(sock, payloads):
+    """
+    通过sendmmsg把一组数据报合并为尽量少的系统调用发出
+    
+    socket已connect，头部不携带地址；内核拒绝或部分失败时
+    由调用方退回逐条send。返回成功发出的条数
+    """
+    n = len(payloads)
+    bufs = [ctypes.create_string_buffer(p, len(p)) for p in payloads]
+    iovs = (_Iovec * n)()
+    msgs = (_Mmsghdr * n)()
+    for i in range(n):
+        iovs[i].iov_base = ctypes.cast(bufs[i], ctypes.c_void_p)
+        iovs[i].iov_len = len(payloads[i])
+        msgs[i].msg_hdr.msg_name = None
+        msgs[i].msg_hdr.msg_namelen = 0
+        msgs[i].msg_hdr.msg_iov = ctypes.pointer(iovs[i])
+        msgs[i].msg_hdr.msg_iovlen = 1
+    
+    mmsghdr_size = ctypes.sizeof(_Mmsghdr)
+    start = 0
+    while start < n:
+        sent = _sendmmsg(sock.fileno(),
+                         ctypes.byref(msgs, start * mmsghdr_size),
+                         n - start, 0)
+        if sent <= 0:
+            break
+        start += sent
+    return start
+
+
+
+# 重复载荷的编码缓存：调用方经常反复发送同一条命令（如query_status），
+# 每次都重做UTF-8编码纯属浪费；按原字符串缓存编码结果，超限整体清空
+_enc_cache = {}
+
+
+def _encode_payload(json_data):
+    """载荷UTF-8编码（相同字符串命中缓存）"""
+    buf = _enc_cache.get(json_data)
+    if buf is None:
+        buf = json_data.encode('utf-8')
+        if len(_enc_cache) >= 64:
+            _enc_cache.clear()
+        _enc_cache[json_data] = buf
+    return buf
+
+
+# 已验证过的socket路径缓存：同一进程内（批量、常驻转发模式）反复
+# 发送时不必每条消息都stat一次；连接出错时由对应路径失效重验
+_verified_paths = set()
+
+
+def _socket_path_ok(socket_path):
+    """检查socket路径是否存在（进程内缓存已验证的路径）"""
+    if socket_path in _verified_paths:
+        return True
+    if os.path.exists(socket_path):
+        _verified_paths.add(socket_path)
+        return True
+    return False
+
+
+def send_json_to_udp_socket(socket_path, json_data, raw=False):
     """
     向指定的Unix UDP socket发送JSON数据
     
@@ -39,15 +143,14 @@ def send_json_to_udp_socket(socket_path, json_data):
     Returns:
         bool: 发送成功返回True，否则返回False
     """
-    # 验证JSON格式
-    try:
-        parsed_json = json.loads(json_data)
-    except json.JSONDecodeError as e:
-        print(f"错误: 无效的JSON格式 - {e}", file=sys.stderr)
+    # 轻量结构检查替代完整json.loads：发送路径不需要解析出对象图，
+    # 格式错误由守护进程端兜底报告；--raw时连这一步也省掉
+    if not raw and json_data.lstrip()[:1] not in ('{', '['):
+        print("错误: 无效的JSON格式 - 数据应以 '{' 或 '[' 开头", file=sys.stderr)
         return False
     
-    # 检查socket文件是否存在
-    if not os.path.exists(socket_path):
+    # 检查socket文件是否存在（结果带进程内缓存）
+    if not _socket_path_ok(socket_path):
         print(f"错误: socket文件不存在 - {socket_path}", file=sys.stderr)
         return False
     
@@ -57,7 +160,7 @@ def send_json_to_udp_socket(socket_path, json_data):
         sock.connect(socket_path)
         
         # 发送JSON数据
-        sock.send(json_data.encode('utf-8'))
+        sock.send(_encode_payload(json_data))
         print(f"成功发送UDP数据到 {socket_path}")
         print(f"发送的数据: {json_data}")
         
@@ -72,56 +175,72 @@ def send_json_to_udp_socket(socket_path, json_data):
         return False
 
 
-def send_json_to_tcp_socket(socket_path, json_data):
+def send_json_to_tcp_socket(socket_path, json_data, expect_reply=False,
+                            reply_timeout=2.0, raw=False):
     """
     向指定的Unix TCP socket发送JSON数据
     
     Args:
         socket_path (str): Unix socket文件路径
         json_data (str): 要发送的JSON数据字符串
+        expect_reply (bool): 是否等待守护进程回复；发完即走的命令
+            不等回复，避免在不回包的守护进程上白等超时
+        reply_timeout (float): 等待回复的超时（秒），仅expect_reply时生效
     
     Returns:
         bool: 发送成功返回True，否则返回False
     """
-    # 验证JSON格式
-    try:
-        parsed_json = json.loads(json_data)
-    except json.JSONDecodeError as e:
-        print(f"错误: 无效的JSON格式 - {e}", file=sys.stderr)
+    # 轻量结构检查替代完整json.loads：发送路径不需要解析出对象图，
+    # 格式错误由守护进程端兜底报告；--raw时连这一步也省掉
+    if not raw and json_data.lstrip()[:1] not in ('{', '['):
+        print("错误: 无效的JSON格式 - 数据应以 '{' 或 '[' 开头", file=sys.stderr)
         return False
     
-    # 检查socket文件是否存在
-    if not os.path.exists(socket_path):
+    # 检查socket文件是否存在（结果带进程内缓存）
+    if not _socket_path_ok(socket_path):
         print(f"错误: socket文件不存在 - {socket_path}", file=sys.stderr)
         return False
     
     try:
         # 创建Unix socket连接 (TCP)
+        # 守护进程只在本机，统一走AF_UNIX；加大收发缓冲区，
+        # 整条JSON一次入内核，send不会在载荷中途阻塞
         sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 262144)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 262144)
         
         # 连接socket
         sock.connect(socket_path)
         
-        # 发送JSON数据
-        sock.send(json_data.encode('utf-8'))
+        # 发送JSON数据（sendall保证短写时自动续传完整载荷）
+        sock.sendall(_encode_payload(json_data))
         print(f"成功发送TCP数据到 {socket_path}")
         print(f"发送的数据: {json_data}")
         
-        # 尝试接收响应（可选）
-        try:
-            sock.settimeout(2.0)  # 设置2秒超时
-            response = sock.recv(1024)
-            if response:
-                print(f"接收的响应: {response.decode('utf-8', errors='ignore')}")
-        except socket.timeout:
-            print("未收到响应或响应超时")
-        except Exception as e:
-            print(f"接收响应时出错: {e}")
+        if expect_reply:
+            # 等待守护进程回复
+            try:
+                sock.settimeout(reply_timeout)
+                response = sock.recv(1024)
+                if response:
+                    print(f"接收的响应: {response.decode('utf-8', errors='ignore')}")
+            except socket.timeout:
+                print("未收到响应或响应超时")
+            except Exception as e:
+                print(f"接收响应时出错: {e}")
+        else:
+            # 发完即走：半关闭写端让守护进程立刻看到EOF，随即关闭，
+            # 不为不存在的回复付最多2秒的等待
+            try:
+                sock.shutdown(socket.SHUT_WR)
+            except OSError:
+                pass
         
         sock.close()
         return True
         
     except socket.error as e:
+        _verified_paths.discard(socket_path)
         print(f"错误: 连接TCP socket失败 - {e}", file=sys.stderr)
         return False
     except Exception as e:
@@ -129,6 +248,268 @@ def send_json_to_tcp_socket(socket_path, json_data):
         return False
 
 
+def _sender_fifo_path(socket_path):
+    """常驻转发进程的控制FIFO路径（跟随目标socket路径派生）"""
+    return f"{socket_path}_sender.fifo"
+
+
+def _sender_reg_path(socket_path):
+    """常驻转发进程的fd移交注册socket路径"""
+    return f"{socket_path}_sender_reg.sock"
+
+
+def try_fd_fast_path(socket_path, json_data):
+    """
+    通过SCM_RIGHTS从常驻转发进程取得已连接的fd直接发送
+    
+    注册socket上一次recvmsg拿到转发进程手里已connect好的DGRAM fd，
+    载荷直接写到目标socket，省掉对目标路径的connect()，也比FIFO
+    路径少一次转发进程的中转拷贝。fd无法跨进程保存，每次调用做一轮
+    注册握手；转发进程不在时返回False
+    
+    Returns:
+        bool: 成功发送返回True
+    """
+    import array
+    
+    reg_path = _sender_reg_path(socket_path)
+    try:
+        reg = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        reg.connect(reg_path)
+    except OSError:
+        return False
+    fd = -1
+    try:
+        fd_size = array.array('i').itemsize
+        msg, ancdata, flags, addr = reg.recvmsg(2, socket.CMSG_LEN(fd_size))
+        for cmsg_level, cmsg_type, cmsg_data in ancdata:
+            if (cmsg_level == socket.SOL_SOCKET
+                    and cmsg_type == socket.SCM_RIGHTS):
+                fds = array.array('i')
+                fds.frombytes(cmsg_data[:fd_size])
+                fd = fds[0]
+                break
+        if fd < 0:
+            return False
+        out = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM, fileno=fd)
+        try:
+            out.send(_encode_payload(json_data))
+        finally:
+            out.close()  # 只关闭本进程收到的副本，转发进程的fd不受影响
+        print(f"成功通过移交fd发送数据到 {socket_path}")
+        print(f"发送的数据: {json_data}")
+        return True
+    except OSError:
+        if fd >= 0:
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+        return False
+    finally:
+        reg.close()
+
+
+def try_fifo_fast_path(socket_path, json_data):
+    """
+    尝试把JSON行写入常驻转发进程的FIFO
+    
+    有--daemon进程在读时，一次FIFO写入即可完成发送，免去本进程的
+    socket()/connect()/close()；没有读者或FIFO不存在时返回False，
+    调用方走普通发送路径
+    
+    Returns:
+        bool: 成功交给转发进程返回True
+    """
+    fifo_path = _sender_fifo_path(socket_path)
+    try:
+        # O_NONBLOCK下无读者时open直接报ENXIO，不会卡住CLI
+        fd = os.open(fifo_path, os.O_WRONLY | os.O_NONBLOCK)
+    except OSError:
+        return False
+    try:
+        os.write(fd, _encode_payload(json_data) + b'\n')
+        print(f"成功通过转发进程发送数据到 {socket_path}")
+        print(f"发送的数据: {json_data}")
+        return True
+    except OSError:
+        return False
+    finally:
+        os.close(fd)
+
+
+def run_sender_daemon(socket_path):
+    """
+    常驻转发模式：连接一次目标socket，循环从控制FIFO读取JSON行并转发
+    
+    shell脚本每翻转一次GPIO就启动一次本工具，解释器启动加socket建立
+    的开销远超发送本身；常驻进程把这部分摊销掉，CLI侧只剩一次FIFO写入
+    
+    Returns:
+        bool: 监听成功返回True，否则返回False
+    """
+    # 检查socket文件是否存在（结果带进程内缓存）
+    if not _socket_path_ok(socket_path):
+        print(f"错误: socket文件不存在 - {socket_path}", file=sys.stderr)
+        return False
+    
+    try:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 1 << 20)
+        sock.connect(socket_path)
+    except socket.error as e:
+        _verified_paths.discard(socket_path)
+        print(f"错误: 连接socket失败 - {e}", file=sys.stderr)
+        return False
+    
+    import array
+    import selectors
+    
+    fifo_path = _sender_fifo_path(socket_path)
+    if not os.path.exists(fifo_path):
+        os.mkfifo(fifo_path)
+    # O_RDWR让本进程自己充当常驻写端，FIFO永远不会报EOF，
+    # selectors只在真有数据时唤醒
+    fifo_fd = os.open(fifo_path, os.O_RDWR | os.O_NONBLOCK)
+    
+    # fd移交注册socket：CLI连上来就把已connect的DGRAM fd通过
+    # SCM_RIGHTS递过去，之后CLI直写目标socket，不经过本进程中转
+    reg_path = _sender_reg_path(socket_path)
+    if os.path.exists(reg_path):
+        os.unlink(reg_path)
+    reg_sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    reg_sock.bind(reg_path)
+    os.chmod(reg_path, 0o777)
+    reg_sock.listen(8)
+    reg_sock.setblocking(False)
+    
+    print(f"转发进程已启动: {fifo_path} -> {socket_path}")
+    print(f"fd移交注册socket: {reg_path}")
+    print("按Ctrl+C退出")
+    
+    sel = selectors.DefaultSelector()
+    sel.register(fifo_fd, selectors.EVENT_READ, 'fifo')
+    sel.register(reg_sock, selectors.EVENT_READ, 'reg')
+    
+    fd_payload = [(socket.SOL_SOCKET, socket.SCM_RIGHTS,
+                   array.array('i', [sock.fileno()]).tobytes())]
+    leftover = b''
+    try:
+        while True:
+            for key, _ in sel.select():
+                if key.data == 'reg':
+                    # 移交fd：一条OK附带SCM_RIGHTS，随即关闭连接
+                    try:
+                        conn, _ = reg_sock.accept()
+                    except OSError:
+                        continue
+                    try:
+                        conn.sendmsg([b'OK'], fd_payload)
+                    except OSError as e:
+                        print(f"移交fd失败: {e}", file=sys.stderr)
+                    finally:
+                        conn.close()
+                    continue
+                
+                # FIFO数据：每行一条JSON，尾部不完整的行留到下一轮
+                while True:
+                    try:
+                        chunk = os.read(fifo_fd, 4096)
+                    except BlockingIOError:
+                        break
+                    if not chunk:
+                        break
+                    leftover += chunk
+                    *lines, leftover = leftover.split(b'\n')
+                    for line in lines:
+                        line = line.strip()
+                        if line:
+                            sock.send(line)
+    except KeyboardInterrupt:
+        print("\n接收到中断信号，转发进程退出")
+    except socket.error as e:
+        print(f"错误: 转发数据失败 - {e}", file=sys.stderr)
+        return False
+    finally:
+        sel.close()
+        os.close(fifo_fd)
+        sock.close()
+        reg_sock.close()
+        for path in (fifo_path, reg_path):
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+    
+    return True
+
+
+def send_json_stream(socket_path, sock_type, payloads, raw=False):
+    """
+    批量发送模式：用同一个已连接的socket发送多条JSON数据
+    
+    逐条调用发送函数时每条消息都要付socket()/connect()/close()的
+    系统调用开销，批量脚本里这部分占了大头；这里连接一次后贯穿全部消息。
+    TCP用MSG_MORE提示内核合并小段，最后一条不带该标志以触发冲刷
+    
+    Args:
+        socket_path (str): Unix socket文件路径
+        sock_type (str): 'udp' 或 'tcp'
+        payloads (list): 要发送的JSON字节串列表
+    
+    Returns:
+        bool: 全部发送成功返回True，否则返回False
+    """
+    # 检查socket文件是否存在（结果带进程内缓存）
+    if not _socket_path_ok(socket_path):
+        print(f"错误: socket文件不存在 - {socket_path}", file=sys.stderr)
+        return False
+    
+    socktype = socket.SOCK_STREAM if sock_type == 'tcp' else socket.SOCK_DGRAM
+    try:
+        sock = socket.socket(socket.AF_UNIX, socktype)
+        sock.connect(socket_path)
+    except socket.error as e:
+        _verified_paths.discard(socket_path)
+        print(f"错误: 连接socket失败 - {e}", file=sys.stderr)
+        return False
+    
+    # 批量载荷只对第一条做结构抽查，其余原样透传
+    if not raw and payloads and bytes(payloads[0]).lstrip()[:1] not in (b'{', b'['):
+        print("错误: 无效的JSON格式 - 数据应以 '{' 或 '[' 开头", file=sys.stderr)
+        sock.close()
+        return False
+    
+    sent = 0
+    try:
+        if sock_type == 'tcp':
+            # 换行分隔的流式发送；MSG_MORE让内核攒够再发
+            msg_more = getattr(socket, 'MSG_MORE', 0)
+            last = len(payloads) - 1
+            for i, payload in enumerate(payloads):
+                sock.sendall(payload + b'\n', msg_more if i < last else 0)
+                sent += 1
+        elif len(payloads) > 1 and _load_sendmmsg() is not None:
+            # UDP下每条JSON必须是独立数据报；sendmmsg一次系统调用提交整批
+            sent = _send_datagrams_mmsg(sock, payloads)
+            # 内核中途拒绝时把剩余消息逐条补发
+            for payload in payloads[sent:]:
+                sock.send(payload)
+                sent += 1
+        else:
+            # 无sendmmsg时复用连接逐条发送
+            for payload in payloads:
+                sock.send(payload)
+                sent += 1
+        print(f"成功批量发送 {sent} 条数据到 {socket_path}")
+        return True
+    except socket.error as e:
+        print(f"错误: 批量发送第 {sent + 1} 条数据失败 - {e}", file=sys.stderr)
+        return False
+    finally:
+        sock.close()
+
+
 def receive_from_tcp_socket(socket_path):
     """
     从指定的Unix TCP socket接收JSON数据（监听模式）
@@ -139,14 +520,20 @@ def receive_from_tcp_socket(socket_path):
     Returns:
         bool: 监听成功返回True，否则返回False
     """
-    # 检查socket文件是否存在
-    if not os.path.exists(socket_path):
+    # 仅接收模式用到的模块在此导入，不拖慢发送路径的启动
+    import selectors
+    import time
+    
+    # 检查socket文件是否存在（结果带进程内缓存）
+    if not _socket_path_ok(socket_path):
         print(f"错误: socket文件不存在 - {socket_path}", file=sys.stderr)
         return False
     
     try:
         # 创建Unix socket连接 (TCP)
         sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # 加大接收缓冲区，状态风暴下减少发送端阻塞
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 262144)
         
         # 连接socket
         sock.connect(socket_path)
@@ -154,20 +541,60 @@ def receive_from_tcp_socket(socket_path):
         print("按Ctrl+C退出监听")
         print("-" * 50)
         
+        # 复用的接收缓冲区：recv每次分配新bytes对象，
+        # recv_into写进同一块bytearray，消除每条消息一次的分配
+        recv_buf = bytearray(65536)
+        recv_view = memoryview(recv_buf)
+
+        # 非阻塞socket配合selector：每次唤醒把接收队列整批排空再等待，
+        # 状态风暴下多条消息只付一次阻塞等待的代价
+        sock.setblocking(False)
+        sel = selectors.DefaultSelector()
+        sel.register(sock, selectors.EVENT_READ)
+
+        # 每条消息直接写stdout的字节缓冲：print()每次都取锁并冲刷，
+        # 高频事件流下成为瓶颈；改为拼好bytes后write，排空一批内核
+        # 队列后统一flush一次。时间戳的日期时间前缀按秒缓存
+        sys.stdout.flush()
+        out = sys.stdout.buffer
+        recv_tag = " 接收到: ".encode('utf-8')
+        ts_last_sec = 0
+        ts_prefix = b''
+
         # 持续接收数据
-        while True:
+        disconnected = False
+        while not disconnected:
             try:
-                # 接收数据
-                data = sock.recv(1024)
-                if not data:
-                    print("连接断开")
-                    break
-                
-                # 解析和打印接收到的数据
-                timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
-                received_data = data.decode('utf-8', errors='ignore')
-                print(f"[{timestamp}] 接收到: {received_data}")
-                
+                sel.select()
+
+                # 排空接收队列，直到内核缓冲区读空
+                wrote = False
+                while True:
+                    try:
+                        nbytes = sock.recv_into(recv_buf)
+                    except BlockingIOError:
+                        break
+                    if not nbytes:
+                        print("连接断开")
+                        disconnected = True
+                        break
+
+                    # 打印接收到的数据（毫秒时间戳）
+                    ns = time.time_ns()
+                    sec = ns // 1000000000
+                    if sec != ts_last_sec:
+                        ts_prefix = time.strftime(
+                            '%Y-%m-%d %H:%M:%S', time.localtime(sec)).encode()
+                        ts_last_sec = sec
+                    out.write(b'[%s.%03d]' % (ts_prefix, ns // 1000000 % 1000))
+                    out.write(recv_tag)
+                    out.write(recv_view[:nbytes])
+                    out.write(b'\n')
+                    wrote = True
+
+                if wrote:
+                    out.flush()
+
             except KeyboardInterrupt:
                 print("\n接收到中断信号，正在停止监听...")
                 break
@@ -177,8 +604,12 @@ def receive_from_tcp_socket(socket_path):
             except Exception as e:
                 print(f"处理接收到的数据时出错: {e}")
                 continue
+
+        out.flush()
+        sel.close()
     
     except socket.error as e:
+        _verified_paths.discard(socket_path)
         print(f"错误: 连接TCP socket失败 - {e}", file=sys.stderr)
         return False
     except Exception as e:
@@ -194,6 +625,19 @@ def receive_from_tcp_socket(socket_path):
 
 
 def main():
+    # 热路径手工解析：shell脚本逐条翻转GPIO时只用 -s/-d 两个参数
+    # （默认UDP发送），这种形态直接发出去，省掉argparse解析器的构建；
+    # 其余参数组合照常走argparse
+    argv = sys.argv[1:]
+    if (len(argv) == 4 and argv[0] in ('-s', '--socket-path')
+            and argv[2] in ('-d', '--data')):
+        success = (try_fifo_fast_path(argv[1], argv[3])
+                   or try_fd_fast_path(argv[1], argv[3])
+                   or send_json_to_udp_socket(argv[1], argv[3]))
+        sys.exit(0 if success else 1)
+    
+    import argparse
+    
     parser = argparse.ArgumentParser(
         description="Unix socket通信工具（支持TCP和UDP，支持发送和接收模式）",
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -202,6 +646,9 @@ def main():
   # UDP发送（默认）
   %(prog)s --socket-path /tmp/gpio.sock --data '{"alias": "sender", "mode": "set", "gpio": 1, "value": 1}'
   
+  # 批量发送（标准输入每行一条JSON，复用一个连接）
+  cat commands.jsonl | %(prog)s --socket-path /tmp/gpio.sock --batch
+  
   # TCP发送
   %(prog)s --socket-path /tmp/gpio_get.sock --type tcp --side send --data '{"type": "query_status"}'
   
@@ -226,6 +673,37 @@ def main():
         help='要发送的JSON数据字符串（必须用引号包围）'
     )
     
+    parser.add_argument(
+        '--batch', '-b',
+        action='store_true',
+        help='批量模式: 从标准输入逐行读取JSON并复用一个连接发送'
+    )
+    
+    parser.add_argument(
+        '--daemon',
+        action='store_true',
+        help='常驻转发模式: 连接一次目标socket，从控制FIFO读取JSON行转发（仅UDP）'
+    )
+    
+    parser.add_argument(
+        '--raw',
+        action='store_true',
+        help='跳过JSON格式检查，载荷原样发送'
+    )
+    
+    parser.add_argument(
+        '--expect-reply',
+        action='store_true',
+        help='TCP发送后等待守护进程回复（默认发完即走）'
+    )
+    
+    parser.add_argument(
+        '--timeout',
+        type=float,
+        default=2.0,
+        help='等待回复的超时秒数（配合--expect-reply，默认2.0）'
+    )
+    
     parser.add_argument(
         '--type', '-t',
         choices=['udp', 'tcp'],
@@ -243,20 +721,42 @@ def main():
     args = parser.parse_args()
     
     # 验证参数组合
-    if args.side == 'send' and not args.data:
-        print("错误: 发送模式需要 --data 参数", file=sys.stderr)
+    if args.side == 'send' and not args.data and not args.batch and not args.daemon:
+        print("错误: 发送模式需要 --data 参数（或使用 --batch 从标准输入读取）", file=sys.stderr)
         sys.exit(1)
     
     if args.side == 'receive' and args.type == 'udp':
         print("错误: UDP不支持接收模式，仅TCP支持监听功能", file=sys.stderr)
         sys.exit(1)
     
+    if args.batch and args.side != 'send':
+        print("错误: --batch 仅支持发送模式", file=sys.stderr)
+        sys.exit(1)
+    
+    if args.daemon and args.type != 'udp':
+        print("错误: --daemon 仅支持UDP", file=sys.stderr)
+        sys.exit(1)
+    
     # 根据指定的类型和模式执行操作
-    if args.side == 'send':
+    if args.daemon:
+        success = run_sender_daemon(args.socket_path)
+    elif args.side == 'send' and args.batch:
+        # 批量模式：标准输入每行一条JSON，空行跳过
+        payloads = [line.encode('utf-8') for line in
+                    (raw.strip() for raw in sys.stdin) if line]
+        success = send_json_stream(args.socket_path, args.type, payloads,
+                                   args.raw)
+    elif args.side == 'send':
         if args.type == 'udp':
-            success = send_json_to_udp_socket(args.socket_path, args.data)
+            # 有常驻转发进程时走FIFO快速路径
+            success = (try_fifo_fast_path(args.socket_path, args.data)
+                       or try_fd_fast_path(args.socket_path, args.data)
+                       or send_json_to_udp_socket(args.socket_path, args.data,
+                                                  args.raw))
         elif args.type == 'tcp':
-            success = send_json_to_tcp_socket(args.socket_path, args.data)
+            success = send_json_to_tcp_socket(args.socket_path, args.data,
+                                              args.expect_reply, args.timeout,
+                                              args.raw)
     elif args.side == 'receive':
         success = receive_from_tcp_socket(args.socket_path)
     else:
@@ -8,29 +8,63 @@ import os
 sys.path.append('/home/xmb505/智能外卖柜样机/debug_utils')
 
 # 首先启动GPIO守护进程
+import selectors
 import subprocess
 import time
 
+
+def wait_for_output(process, sentinel, timeout=5.0):
+    """
+    等待子进程stdout出现指定标志行，返回这期间读到的全部输出
+
+    用selectors监听stdout就绪替代固定时长的sleep：子进程就绪后
+    立刻返回，不用每次都白等满整段时间
+    """
+    fd = process.stdout.fileno()
+    os.set_blocking(fd, False)
+    sel = selectors.DefaultSelector()
+    sel.register(process.stdout, selectors.EVENT_READ)
+    deadline = time.monotonic() + timeout
+    collected = b''
+    try:
+        while sentinel.encode('utf-8') not in collected:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                print(f"警告: 等待 '{sentinel}' 超时（{timeout}秒）")
+                break
+            if not sel.select(remaining):
+                continue
+            chunk = os.read(fd, 4096)
+            if not chunk:  # 子进程关闭了stdout
+                break
+            collected += chunk
+    finally:
+        sel.close()
+    return collected.decode('utf-8', 'replace')
+
+
 print("启动GPIO守护进程...")
+# -u让子进程stdout不做块缓冲，否则接管道后哨兵行到不了这里
 daemon_process = subprocess.Popen(
-    ['python3', 'daemon_gpio.py', '--simulate'],
+    ['python3', '-u', 'daemon_gpio.py', '--simulate'],
     cwd='/home/xmb505/智能外卖柜样机/deamon/daemon_gpio',
     stdout=subprocess.PIPE,
     stderr=subprocess.PIPE
 )
 
-time.sleep(2)  # 等待守护进程启动
+# 等守护进程真正初始化完成，而不是固定睡2秒
+wait_for_output(daemon_process, "GPIO守护进程初始化完成")
 
 print("启动gpio_read.py工具...")
 read_process = subprocess.Popen(
-    ['python3', 'gpio_read.py', '--socket_path', '/tmp/gpio_get.sock'],
+    ['python3', '-u', 'gpio_read.py', '--socket_path', '/tmp/gpio_get.sock'],
     cwd='/home/xmb505/智能外卖柜样机/debug_utils',
     stdout=subprocess.PIPE,
-    stderr=subprocess.PIPE,
-    text=True
+    stderr=subprocess.PIPE
 )
 
-time.sleep(3)  # 等待gpio_read运行并发送初始查询
+# 等到初始查询的状态回复被打印出来就停，同样不固定睡3秒
+read_output = wait_for_output(read_process, "GPIO事件:")
 
 print("停止所有进程...")
 read_process.terminate()
@@ -38,9 +72,11 @@ daemon_process.terminate()
 
 print("\n=== gpio_read.py 输出 ===")
 stdout, stderr = read_process.communicate(timeout=5)
+if read_output:
+    print(read_output, end='')
 if stdout:
-    print(stdout)
+    print(stdout.decode('utf-8', 'replace'))
 if stderr:
-    print("错误输出:", stderr)
+    print("错误输出:", stderr.decode('utf-8', 'replace'))
 
-print("\n测试完成")
\ No newline at end of file
+print("\n测试完成")
@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 
+import itertools
 import sys
 import serial
 import configparser
@@ -29,11 +30,9 @@ class USBGPIOController:
         self.ser.write(command)
     
     def set_gpio(self, gpio_states):
-        command = bytearray([0x3A])
-        for gpio_pin, state in gpio_states.items():
-            command.append(gpio_pin)
-            command.append(state)
-        self.ser.write(bytes(command))
+        # 一次分配拼出完整命令，避免bytearray逐字节append的增长检查
+        command = b'\x3A' + bytes(itertools.chain.from_iterable(gpio_states.items()))
+        self.ser.write(command)
 
 
 def parse_set_command(args):
@@ -51,12 +50,14 @@ def print_usage():
     print()
     print("命令:")
     print("  set <引脚号> <状态> [引脚号 状态 ...]      - 批量设置GPIO状态")
+    print("  stream                              - 常驻模式，从标准输入逐行读取set命令")
     print()
     print("示例:")
     print("  ./usb2gpio.py set 1 1              - 设置引脚1为高电平")
     print("  ./usb2gpio.py set 1 0              - 设置引脚1为低电平")
     print("  ./usb2gpio.py set 1 1 2 1          - 设置引脚1和2为高电平")
     print("  ./usb2gpio.py --debug-timer set 1 1 - 设置引脚1为高电平并显示执行时间")
+    print("  printf 'set 1 1\\nset 1 0\\n' | ./usb2gpio.py stream - 复用一次串口打开发送整串命令")
 
 
 def main():
@@ -91,6 +92,37 @@ def main():
         finally:
             controller.close()
     
+    elif command == 'stream':
+        # 常驻模式：串口只打开一次，逐行读取set命令复用同一连接发送。
+        # 打开/dev/ttyUSB0要经历tcsetattr和适配器复位，逐条调用本工具时
+        # 这部分开销远超写入本身，长串命令用stream可全部摊销掉
+        controller = USBGPIOController()
+        count = 0
+        try:
+            controller.ser.reset_output_buffer()
+            for line in sys.stdin:
+                args = line.split()
+                if not args:
+                    continue
+                # 允许每行带不带set前缀两种写法
+                if args[0] == 'set':
+                    args = args[1:]
+                try:
+                    gpio_states = parse_set_command(args)
+                except (ValueError, IndexError):
+                    print(f"错误: 无法解析命令行 '{line.strip()}'", file=sys.stderr)
+                    continue
+                if gpio_states:
+                    controller.set_gpio(gpio_states)
+                    count += 1
+            # 整批结束后统一flush，而不是每条命令等一次串口排空
+            controller.ser.flush()
+            if debug_timer:
+                elapsed_time = (time.perf_counter() - start_time) * 1000
+                print(f"执行时间: {elapsed_time:.2f}ms（共{count}条命令）")
+        finally:
+            controller.close()
+
     else:
         print(f"错误: 未知命令 '{command}'", file=sys.stderr)
         print_usage()